@@ -5,6 +5,10 @@ Quick Start Example for QDrantIngest
 This script demonstrates how to use QDrantIngest to process a COCO dataset
 and create a searchable Qdrant vector database.
 
+Images and categories are looked up through dicts keyed by ID rather than by
+scanning the COCO lists for every annotation. main.py uses the same pattern
+(plus parallel cropping and concurrent requests) for full datasets.
+
 Usage:
     python examples/quick_start.py
 
@@ -12,6 +16,7 @@ Make sure to set your JINA_API_KEY environment variable first:
     export JINA_API_KEY="your-api-key-here"
 """
 
+import logging
 import os
 import sys
 from pathlib import Path
@@ -29,6 +34,13 @@ from tqdm import tqdm
 def main():
     """Run a quick start example."""
 
+    # Only surface warnings and errors; per-object progress goes to the tqdm bar
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(levelname)s: %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+
     # Check for API key
     if not os.environ.get("JINA_API_KEY"):
         print("ERROR: JINA_API_KEY environment variable not set!")
@@ -100,20 +112,31 @@ def main():
     batch_size = 10
     annotations_to_process = coco_data['annotations'][:batch_size]
 
+    # Index images and categories by ID for constant-time lookups
+    images_by_id = {img['id']: img for img in coco_data['images']}
+    categories_by_id = {cat['id']: cat for cat in coco_data['categories']}
+
+    # Embeddings are requested in batches to avoid one API round-trip per object
+    embedding_batch_size = 32
+    cropped_images = []
+    metadatas = []
+
+    def flush():
+        """Embed and upload the accumulated objects."""
+        embeddings = embedding_generator.generate_embeddings(cropped_images)
+        qdrant_uploader.upload_batch([
+            {'id': metadata['id'], 'vector': embedding, 'payload': metadata['payload']}
+            for metadata, embedding in zip(metadatas, embeddings)
+        ])
+        cropped_images.clear()
+        metadatas.clear()
+
     processed_count = 0
     with tqdm(total=len(annotations_to_process), desc="Processing") as pbar:
         for ann in annotations_to_process:
-            # Get image info
-            image_info = next(
-                img for img in coco_data['images']
-                if img['id'] == ann['image_id']
-            )
-
-            # Get category info
-            category = next(
-                cat for cat in coco_data['categories']
-                if cat['id'] == ann['category_id']
-            )
+            # Get image and category info
+            image_info = images_by_id[ann['image_id']]
+            category = categories_by_id[ann['category_id']]
 
             # Crop object from image
             cropped_image = image_processor.crop_object(
@@ -123,13 +146,9 @@ def main():
             )
 
             if cropped_image is not None:
-                # Generate embedding
-                embedding = embedding_generator.generate_embeddings([cropped_image])[0]
-
-                # Upload to QDrant
-                qdrant_uploader.upload_batch([{
+                cropped_images.append(cropped_image)
+                metadatas.append({
                     'id': ann['id'],
-                    'vector': embedding,
                     'payload': {
                         'image_id': image_info['id'],
                         'file_name': image_info['file_name'],
@@ -140,12 +159,24 @@ def main():
                         'area': ann.get('area'),
                         'iscrowd': ann.get('iscrowd', 0)
                     }
-                }])
+                })
 
                 processed_count += 1
 
+                # Generate embeddings and upload once a full batch is ready
+                if len(cropped_images) >= embedding_batch_size:
+                    flush()
+
+            pbar.set_postfix(processed=processed_count, refresh=False)
             pbar.update(1)
 
+    # Embed and upload any remaining objects
+    if cropped_images:
+        flush()
+
+    # Re-enable vector indexing, which is deferred during the upload
+    qdrant_uploader.finalize()
+
     print(f"\n  ✓ Successfully processed {processed_count} objects")
 
     # Step 4: Verify the database
@@ -19,10 +19,17 @@ This script:
 import os
 import sys
 import json
+import logging
 import tempfile
 import shutil
 from pathlib import Path
 
+# Use orjson for writing the test data when available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -147,8 +154,12 @@ def create_test_data(temp_dir):
     }
 
     annotations_path = Path(temp_dir) / "annotations.json"
-    with open(annotations_path, 'w') as f:
-        json.dump(coco_annotation, f, indent=2)
+    if orjson is not None:
+        with open(annotations_path, 'wb') as f:
+            f.write(orjson.dumps(coco_annotation, option=orjson.OPT_INDENT_2))
+    else:
+        with open(annotations_path, 'w') as f:
+            json.dump(coco_annotation, f, indent=2)
     print_success(f"Created test annotations: {annotations_path}")
 
     return str(annotations_path), str(images_dir)
@@ -219,6 +230,7 @@ def test_pipeline(annotations_path, images_dir, output_path):
                 'bbox': ann['bbox']
             }
         }])
+        uploader.finalize()
         print_success("QDrant uploader works")
 
         # Step 5: Verify database
@@ -259,6 +271,13 @@ def test_pipeline(annotations_path, images_dir, output_path):
 
 def main():
     """Run verification."""
+    # Library warnings and errors are reported through logging
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(levelname)s: %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+
     print_header("QDrantIngest Installation Verification")
 
     # Check dependencies
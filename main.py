@@ -4,11 +4,16 @@ QDrantIngest: Convert COCO annotations to QDrant vector database with Jina AI em
 """
 
 import argparse
+import asyncio
 import json
+import logging
 import os
 import sys
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Any, Union
 
 import numpy as np
 from PIL import Image
@@ -20,7 +25,7 @@ from tqdm import tqdm
 from qdrantingest.coco_parser import CocoParser
 from qdrantingest.image_processor import ImageProcessor
 from qdrantingest.embedding_generator import EmbeddingGenerator
-from qdrantingest.qdrant_uploader import QdrantUploader
+from qdrantingest.qdrant_uploader import ParallelUploader, QdrantUploader
 
 
 def parse_args() -> argparse.Namespace:
@@ -52,11 +57,59 @@ def parse_args() -> argparse.Namespace:
         default="coco_objects",
         help="Name of QDrant collection to create (default: coco_objects)"
     )
+    parser.add_argument(
+        "--qdrant-url", 
+        type=str, 
+        default=None,
+        help="URL of a remote QDrant server; if unset, a local database is stored at --output"
+    )
+    parser.add_argument(
+        "--qdrant-api-key", 
+        type=str, 
+        default=os.environ.get("QDRANT_API_KEY"),
+        help="API key for the remote QDrant server (default: QDRANT_API_KEY env var)"
+    )
+    parser.add_argument(
+        "--no-quantization", 
+        action="store_true",
+        help="Don't keep int8-quantized vectors for search in new collections"
+    )
+    parser.add_argument(
+        "--prefer-grpc", 
+        action="store_true",
+        help="Talk to the remote QDrant server over gRPC instead of REST"
+    )
+    parser.add_argument(
+        "--upload-parallel", 
+        type=int, 
+        default=1,
+        help="Number of uploader processes; values above 1 require --qdrant-url (default: 1)"
+    )
     parser.add_argument(
         "--batch-size", 
         type=int, 
-        default=32,
-        help="Batch size for processing (default: 32)"
+        default=128,
+        help="Number of objects per embedding request; should not exceed the "
+             "embedding endpoint's maximum inputs per request (default: 128)"
+    )
+    parser.add_argument(
+        "--max-concurrent-requests", 
+        type=int, 
+        default=8,
+        help="Maximum number of embedding batches in flight at once; "
+             "1 processes batches sequentially (default: 8)"
+    )
+    parser.add_argument(
+        "--num-workers", 
+        type=int, 
+        default=8,
+        help="Number of workers that load and crop images ahead of embedding; "
+             "0 crops in the main thread (default: 8)"
+    )
+    parser.add_argument(
+        "--use-processes", 
+        action="store_true",
+        help="Crop in worker processes instead of threads (for CPU-bound segmentation cropping)"
     )
     parser.add_argument(
         "--embedding-model", 
@@ -75,6 +128,22 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Use segmentation masks for cropping instead of bounding boxes"
     )
+    parser.add_argument(
+        "--stream-annotations", 
+        action="store_true",
+        help="Parse the annotations file incrementally to reduce peak memory (requires ijson)"
+    )
+    parser.add_argument(
+        "--skip-validation", 
+        action="store_true",
+        help="Skip checking that annotations reference existing images and categories"
+    )
+    parser.add_argument(
+        "--embedding-cache", 
+        type=str, 
+        default=None,
+        help="Directory of an on-disk cache of embeddings reused across runs (requires lmdb)"
+    )
     parser.add_argument(
         "--skip-existing", 
         action="store_true",
@@ -84,9 +153,322 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+class CroppedBatch(NamedTuple):
+    """Objects cropped from a batch of annotations, stored as parallel lists."""
+    
+    # Number of annotations in the batch, including ones that could not be cropped
+    num_annotations: int
+    images: List[Image.Image]
+    annotations: List[Dict[str, Any]]
+    image_infos: List[Dict[str, Any]]
+    categories: List[Dict[str, Any]]
+
+
+def iter_cropped_batches(
+    annotations: List[Dict[str, Any]],
+    images_by_id: Dict[int, Dict[str, Any]],
+    categories_by_id: Dict[int, Dict[str, Any]],
+    image_processor: ImageProcessor,
+    batch_size: int,
+    executor: Optional[Executor] = None,
+    prefetch: Optional[int] = None,
+    readahead: int = 64
+) -> Iterator[CroppedBatch]:
+    """
+    Crop objects for consecutive batches of annotations.
+    
+    Annotations are grouped by image so each image is loaded once for all of
+    its objects. When an executor is given, images are cropped in the
+    background with up to `prefetch` annotations in flight ahead of the
+    consumer, so image loading and cropping overlap with embedding and
+    uploading of earlier batches. Image files are additionally read ahead
+    into the OS page cache `readahead` images before they are cropped.
+    
+    Args:
+        annotations: Annotations to crop
+        images_by_id: Image information keyed by image ID
+        categories_by_id: Categories keyed by category ID
+        image_processor: Processor used to crop the objects
+        batch_size: Number of annotations per batch
+        executor: Optional executor to crop the objects in the background
+        prefetch: Maximum number of annotations in flight (default: 4 * batch_size)
+        readahead: Number of images to read ahead of the one being cropped
+        
+    Yields:
+        A CroppedBatch for every `batch_size` annotations, holding the annotations
+        that could be cropped
+    """
+    if executor is None:
+        window = 1
+    else:
+        window = prefetch or 4 * batch_size
+    
+    # Group annotations by image, keeping the order in which images first appear
+    annotations_by_image = defaultdict(list)
+    for ann in annotations:
+        annotations_by_image[ann['image_id']].append(ann)
+    
+    group_iter = iter(annotations_by_image.items())
+    readahead_iter = iter(annotations_by_image)
+    image_processor.prefetch(
+        images_by_id[image_id]['file_name'] for image_id in islice(readahead_iter, readahead)
+    )
+    pending = deque()
+    in_flight = 0
+    num_annotations = 0
+    images, batch_anns, batch_infos, batch_cats = [], [], [], []
+    
+    while True:
+        # Keep the window of in-flight crops full
+        while in_flight < window:
+            group = next(group_iter, None)
+            if group is None:
+                break
+            
+            image_id, image_anns = group
+            image_info = images_by_id[image_id]
+            image_processor.prefetch(
+                images_by_id[ahead_id]['file_name'] for ahead_id in islice(readahead_iter, 1)
+            )
+            crop_args = (
+                image_info['file_name'],
+                [(ann.get('bbox'), ann.get('segmentation')) for ann in image_anns]
+            )
+            if executor is not None:
+                cropped_images = executor.submit(image_processor.crop_objects_batch, *crop_args)
+            else:
+                cropped_images = image_processor.crop_objects_batch(*crop_args)
+            pending.append((image_anns, image_info, cropped_images))
+            in_flight += len(image_anns)
+        
+        if not pending:
+            break
+        
+        image_anns, image_info, cropped_images = pending.popleft()
+        in_flight -= len(image_anns)
+        if executor is not None:
+            cropped_images = cropped_images.result()
+        
+        for ann, cropped_image in zip(image_anns, cropped_images):
+            num_annotations += 1
+            if cropped_image is not None:
+                images.append(cropped_image)
+                batch_anns.append(ann)
+                batch_infos.append(image_info)
+                batch_cats.append(categories_by_id[ann['category_id']])
+            
+            if num_annotations == batch_size:
+                yield CroppedBatch(num_annotations, images, batch_anns, batch_infos, batch_cats)
+                num_annotations = 0
+                images, batch_anns, batch_infos, batch_cats = [], [], [], []
+    
+    if num_annotations:
+        yield CroppedBatch(num_annotations, images, batch_anns, batch_infos, batch_cats)
+
+
+def build_upload_objects(
+    batch: CroppedBatch,
+    embeddings: List[List[float]]
+) -> List[Dict[str, Any]]:
+    """
+    Combine cropped objects with their embeddings into QDrant upload objects.
+    
+    Args:
+        batch: Cropped objects as yielded by iter_cropped_batches()
+        embeddings: Embedding vector for each cropped object
+        
+    Returns:
+        List of objects in the format expected by QdrantUploader.upload_batch()
+    """
+    return [
+        {
+            'id': ann['id'],
+            'vector': embedding,
+            'payload': {
+                'image_id': image_info['id'],
+                'file_name': image_info['file_name'],
+                'category_id': category['id'],
+                'category_name': category['name'],
+                'bbox': ann.get('bbox'),
+                'segmentation': ann.get('segmentation'),
+                'area': ann.get('area'),
+                'iscrowd': ann.get('iscrowd', 0)
+            }
+        }
+        for ann, image_info, category, embedding in zip(
+            batch.annotations, batch.image_infos, batch.categories, embeddings
+        )
+    ]
+
+
+def process_annotations(
+    annotations: List[Dict[str, Any]],
+    images_by_id: Dict[int, Dict[str, Any]],
+    categories_by_id: Dict[int, Dict[str, Any]],
+    image_processor: ImageProcessor,
+    embedding_generator: EmbeddingGenerator,
+    qdrant_uploader: Union[QdrantUploader, ParallelUploader],
+    batch_size: int,
+    crop_executor: Optional[Executor] = None
+) -> None:
+    """
+    Process annotations one batch at a time.
+    
+    Args:
+        annotations: Annotations to process
+        images_by_id: Image information keyed by image ID
+        categories_by_id: Categories keyed by category ID
+        image_processor: Processor used to crop the objects
+        embedding_generator: Generator used to embed the cropped objects
+        qdrant_uploader: Uploader used to store the embeddings
+        batch_size: Number of objects per embedding request
+        crop_executor: Optional executor to crop the objects in the background
+    """
+    batches = iter_cropped_batches(
+        annotations,
+        images_by_id,
+        categories_by_id,
+        image_processor,
+        batch_size,
+        executor=crop_executor
+    )
+    
+    processed = 0
+    with tqdm(total=len(annotations), desc="Processing objects") as pbar:
+        for batch in batches:
+            # Generate embeddings for cropped objects
+            if batch.images:
+                embeddings = embedding_generator.generate_embeddings(batch.images)
+                
+                # Upload to QDrant
+                qdrant_uploader.upload_batch(build_upload_objects(batch, embeddings))
+                processed += len(batch.images)
+            
+            pbar.set_postfix(processed=processed, refresh=False)
+            pbar.update(batch.num_annotations)
+
+
+async def main_async(
+    annotations: List[Dict[str, Any]],
+    images_by_id: Dict[int, Dict[str, Any]],
+    categories_by_id: Dict[int, Dict[str, Any]],
+    image_processor: ImageProcessor,
+    embedding_generator: EmbeddingGenerator,
+    qdrant_uploader: Union[QdrantUploader, ParallelUploader],
+    batch_size: int,
+    max_concurrent_requests: int = 8,
+    max_concurrent_uploads: int = 4,
+    crop_executor: Optional[Executor] = None
+) -> None:
+    """
+    Process annotations with several embedding batches in flight at once.
+    
+    Uploads run as separate tasks, so a batch releases its embedding slot as
+    soon as its embeddings arrive and the next batch can be embedded while the
+    previous one is uploading.
+    
+    Args:
+        annotations: Annotations to process
+        images_by_id: Image information keyed by image ID
+        categories_by_id: Categories keyed by category ID
+        image_processor: Processor used to crop the objects
+        embedding_generator: Generator used to embed the cropped objects
+        qdrant_uploader: Uploader used to store the embeddings
+        batch_size: Number of objects per embedding request
+        max_concurrent_requests: Maximum number of embedding requests in flight
+        max_concurrent_uploads: Maximum number of uploads in flight
+        crop_executor: Optional executor to crop the objects in the background
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    upload_semaphore = asyncio.Semaphore(max_concurrent_uploads)
+    batch_tasks = []
+    upload_tasks = []
+    processed = 0
+    
+    # Embedding and upload tasks are only awaited at the end, so the first
+    # one to fail records its error and cancels the pipeline instead of
+    # letting the remaining batches be embedded and uploaded
+    pipeline_task = asyncio.current_task()
+    errors: List[BaseException] = []
+    
+    def check_task(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None and not errors:
+            errors.append(task.exception())
+            pipeline_task.cancel()
+    
+    batches = iter_cropped_batches(
+        annotations,
+        images_by_id,
+        categories_by_id,
+        image_processor,
+        batch_size,
+        executor=crop_executor
+    )
+    
+    with tqdm(total=len(annotations), desc="Processing objects") as pbar:
+        async def upload(upload_objects: List[Dict[str, Any]]):
+            nonlocal processed
+            try:
+                await qdrant_uploader.aupload_batch(upload_objects)
+            finally:
+                upload_semaphore.release()
+            
+            # Only count objects once they are stored
+            processed += len(upload_objects)
+            pbar.set_postfix(processed=processed, refresh=False)
+        
+        async def process_batch(batch: CroppedBatch):
+            try:
+                if batch.images:
+                    embeddings = await embedding_generator.agenerate_embeddings(batch.images)
+                    upload_objects = build_upload_objects(batch, embeddings)
+            finally:
+                semaphore.release()
+            
+            if batch.images:
+                await upload_semaphore.acquire()
+                upload_task = asyncio.create_task(upload(upload_objects))
+                upload_task.add_done_callback(check_task)
+                upload_tasks.append(upload_task)
+            
+            pbar.update(batch.num_annotations)
+        
+        try:
+            while True:
+                # Only take the next batch once an embedding slot is free
+                await semaphore.acquire()
+                
+                # Wait for the batch's crops off the event loop
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    semaphore.release()
+                    break
+                
+                batch_task = asyncio.create_task(process_batch(batch))
+                batch_task.add_done_callback(check_task)
+                batch_tasks.append(batch_task)
+            
+            await asyncio.gather(*batch_tasks)
+            await asyncio.gather(*upload_tasks)
+        except asyncio.CancelledError:
+            if errors:
+                raise errors[0]
+            raise
+        finally:
+            # Stop any batches and uploads still in flight after a failure
+            for task in batch_tasks + upload_tasks:
+                task.remove_done_callback(check_task)
+                task.cancel()
+            await asyncio.gather(*batch_tasks, *upload_tasks, return_exceptions=True)
+            await embedding_generator.aclose()
+            await qdrant_uploader.aclose()
+
+
 def main() -> int:
     """Main entry point for QDrantIngest."""
     args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
     
     # Validate input paths
     annotations_path = Path(args.annotations)
@@ -101,6 +483,10 @@ def main() -> int:
         print(f"Error: Images directory not found: {images_path}")
         return 1
     
+    if args.upload_parallel > 1 and not args.qdrant_url:
+        print("Error: --upload-parallel requires --qdrant-url (local storage allows only one writer)")
+        return 1
+    
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
@@ -111,11 +497,21 @@ def main() -> int:
     
     try:
         # Parse COCO annotations
-        parser = CocoParser(annotations_path)
-        coco_data = parser.parse()
+        parser = CocoParser(annotations_path, validate=not args.skip_validation)
+        if args.stream_annotations:
+            coco_data = parser.parse_streaming()
+        else:
+            coco_data = parser.parse()
         
         print(f"Found {len(coco_data['images'])} images and {len(coco_data['annotations'])} annotations")
         
+        # Process annotations sorted by image so consecutive crops reuse the decoded image
+        coco_data['annotations'].sort(key=lambda ann: (ann['image_id'], ann.get('id', 0)))
+        
+        # Index images and categories by ID for constant-time lookups
+        images_by_id = {img['id']: img for img in coco_data['images']}
+        categories_by_id = {cat['id']: cat for cat in coco_data['categories']}
+        
         # Initialize image processor
         image_processor = ImageProcessor(
             images_dir=images_path,
@@ -125,90 +521,88 @@ def main() -> int:
         # Initialize embedding generator
         embedding_generator = EmbeddingGenerator(
             model_name=args.embedding_model,
-            vector_size=args.vector_size
+            vector_size=args.vector_size,
+            cache_dir=args.embedding_cache
         )
         
         # Initialize QDrant uploader
         qdrant_uploader = QdrantUploader(
             path=str(output_path),
+            url=args.qdrant_url,
+            api_key=args.qdrant_api_key,
             collection_name=args.collection,
-            vector_size=args.vector_size
+            vector_size=args.vector_size,
+            prefer_grpc=args.prefer_grpc,
+            quantize=not args.no_quantization
         )
         
-        # Check if collection already exists
-        if args.skip_existing and qdrant_uploader.collection_exists():
+        # Skip collections that existed before this run. The uploader has already
+        # created the collection if it was missing, so collection_exists() is
+        # always true here.
+        if args.skip_existing and not qdrant_uploader.created_collection:
             print(f"Collection '{args.collection}' already exists. Skipping processing.")
             return 0
         
+        # Optionally spread uploads over several processes
+        batch_uploader = qdrant_uploader
+        if args.upload_parallel > 1:
+            batch_uploader = ParallelUploader(
+                collection_name=args.collection,
+                url=args.qdrant_url,
+                api_key=args.qdrant_api_key,
+                num_workers=args.upload_parallel,
+                prefer_grpc=args.prefer_grpc
+            )
+        
         # Process objects in batches
-        total_objects = len(coco_data['annotations'])
         batch_size = args.batch_size
         
-        with tqdm(total=total_objects, desc="Processing objects") as pbar:
-            for i in range(0, total_objects, batch_size):
-                batch_annotations = coco_data['annotations'][i:i+batch_size]
-                
-                # Get image data for this batch
-                image_ids = [ann['image_id'] for ann in batch_annotations]
-                image_data = {
-                    img['id']: img for img in coco_data['images'] 
-                    if img['id'] in image_ids
-                }
-                
-                # Process images to get cropped objects
-                cropped_objects = []
-                for ann in batch_annotations:
-                    image_info = image_data[ann['image_id']]
-                    category = next(
-                        cat for cat in coco_data['categories'] 
-                        if cat['id'] == ann['category_id']
-                    )
-                    
-                    # Crop the object
-                    cropped_image = image_processor.crop_object(
-                        image_filename=image_info['file_name'],
-                        bbox=ann.get('bbox'),
-                        segmentation=ann.get('segmentation')
-                    )
-                    
-                    if cropped_image is not None:
-                        cropped_objects.append({
-                            'image': cropped_image,
-                            'annotation': ann,
-                            'image_info': image_info,
-                            'category': category
-                        })
-                
-                # Generate embeddings for cropped objects
-                if cropped_objects:
-                    images = [obj['image'] for obj in cropped_objects]
-                    embeddings = embedding_generator.generate_embeddings(images)
-                    
-                    # Prepare objects for upload
-                    upload_objects = []
-                    for i, obj in enumerate(cropped_objects):
-                        upload_objects.append({
-                            'id': obj['annotation']['id'],
-                            'vector': embeddings[i],
-                            'payload': {
-                                'image_id': obj['image_info']['id'],
-                                'file_name': obj['image_info']['file_name'],
-                                'category_id': obj['category']['id'],
-                                'category_name': obj['category']['name'],
-                                'bbox': obj['annotation'].get('bbox'),
-                                'segmentation': obj['annotation'].get('segmentation'),
-                                'area': obj['annotation'].get('area'),
-                                'iscrowd': obj['annotation'].get('iscrowd', 0)
-                            }
-                        })
-                    
-                    # Upload to QDrant
-                    qdrant_uploader.upload_batch(upload_objects)
-                
-                pbar.update(len(batch_annotations))
+        # Load and crop images in the background. Threads are enough for decoding,
+        # since PIL releases the GIL while decoding images.
+        crop_executor = None
+        if args.num_workers > 0:
+            if args.use_processes:
+                crop_executor = ProcessPoolExecutor(max_workers=args.num_workers)
+            else:
+                crop_executor = ThreadPoolExecutor(max_workers=args.num_workers)
+        
+        try:
+            if args.max_concurrent_requests > 1:
+                asyncio.run(main_async(
+                    coco_data['annotations'],
+                    images_by_id,
+                    categories_by_id,
+                    image_processor,
+                    embedding_generator,
+                    batch_uploader,
+                    batch_size,
+                    max_concurrent_requests=args.max_concurrent_requests,
+                    crop_executor=crop_executor
+                ))
+            else:
+                process_annotations(
+                    coco_data['annotations'],
+                    images_by_id,
+                    categories_by_id,
+                    image_processor,
+                    embedding_generator,
+                    batch_uploader,
+                    batch_size,
+                    crop_executor=crop_executor
+                )
+                if batch_uploader is not qdrant_uploader:
+                    batch_uploader.close()
+        finally:
+            if crop_executor is not None:
+                crop_executor.shutdown()
+            image_processor.close()
+            embedding_generator.close()
+            
+            # Build the vector index now that the points are uploaded. Also done
+            # after a failed run, so the collection isn't left without indexing.
+            qdrant_uploader.finalize()
         
-        print(f"Successfully processed {total_objects} objects.")
-        print(f"QDrant collection '{args.collection}' created at {output_path}")
+        print(f"QDrant collection '{args.collection}' created at {args.qdrant_url or output_path}")
         
         return 0
         
@@ -0,0 +1,127 @@
+"""
+Fast loading of COCO annotation fields into NumPy arrays using simdjson.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+# Try to import simdjson (pysimdjson)
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+class FastAnnotationArrays:
+    """
+    Fixed-size COCO annotation fields parsed straight into NumPy arrays.
+
+    The annotations file is parsed with simdjson, whose document elements are
+    read lazily, so no Python dictionary is created per annotation. Only the
+    fields with a fixed size (IDs and bounding boxes) are extracted;
+    segmentation polygons can be fetched one at a time with segmentation().
+    """
+
+    def __init__(self, annotations_path: Union[str, Path], validate: bool = True):
+        """
+        Parse the annotations file.
+
+        Args:
+            annotations_path: Path to the COCO annotations JSON file
+            validate: Whether to check that all annotations reference existing
+                      images and categories
+
+        Raises:
+            ImportError: If pysimdjson is not installed
+            ValueError: If the file is not valid COCO JSON
+        """
+        if simdjson is None:
+            raise ImportError(
+                "pysimdjson package is not installed. "
+                "Please install it using: pip install pysimdjson"
+            )
+
+        # The parser owns the document memory, so keep it alive with the document
+        self._parser = simdjson.Parser()
+        try:
+            with open(annotations_path, 'rb') as f:
+                self._document = self._parser.parse(f.read())
+        except ValueError:
+            raise ValueError(f"Invalid JSON format in COCO annotations file: {annotations_path}")
+
+        try:
+            self._annotations = self._document['annotations']
+            self.arrays = self._extract_arrays(self._annotations)
+            if validate:
+                self._validate_references()
+        except KeyError as e:
+            raise ValueError(f"Missing required field in COCO annotations: {e}")
+
+    def _extract_arrays(self, annotations: Any) -> Dict[str, np.ndarray]:
+        """
+        Copy the fixed-size annotation fields into preallocated arrays.
+
+        Args:
+            annotations: simdjson array of annotation objects
+
+        Returns:
+            Dict of arrays in the format returned by CocoParser.parse_soa()
+        """
+        count = len(annotations)
+        ids = np.empty(count, dtype=np.int64)
+        image_ids = np.empty(count, dtype=np.int64)
+        category_ids = np.empty(count, dtype=np.int64)
+        bboxes = np.full((count, 4), np.nan, dtype=np.float32)
+
+        for i, ann in enumerate(annotations):
+            ids[i] = ann['id']
+            image_ids[i] = ann['image_id']
+            category_ids[i] = ann['category_id']
+            bbox = ann.get('bbox')
+            if bbox is not None and len(bbox) == 4:
+                bboxes[i] = np.frombuffer(bbox.as_buffer(of_type='d'), dtype=np.float64)
+
+        return {
+            'ids': ids,
+            'image_ids': image_ids,
+            'category_ids': category_ids,
+            'bboxes': bboxes,
+        }
+
+    def _validate_references(self):
+        """
+        Validate that all annotations reference valid images and categories.
+
+        Raises:
+            ValueError: If an annotation references a non-existent image or category
+        """
+        known_images = np.fromiter((img['id'] for img in self._document['images']), dtype=np.int64)
+        known_categories = np.fromiter((cat['id'] for cat in self._document['categories']), dtype=np.int64)
+
+        bad_images = ~np.isin(self.arrays['image_ids'], known_images)
+        bad_categories = ~np.isin(self.arrays['category_ids'], known_categories)
+        bad = bad_images | bad_categories
+
+        if bad.any():
+            # Report the first offending annotation, as CocoParser does
+            i = int(np.argmax(bad))
+            if bad_images[i]:
+                raise ValueError(f"Annotation {self.arrays['ids'][i]} references non-existent image ID {self.arrays['image_ids'][i]}")
+            raise ValueError(f"Annotation {self.arrays['ids'][i]} references non-existent category ID {self.arrays['category_ids'][i]}")
+
+    def segmentation(self, index: int) -> Optional[List[Any]]:
+        """
+        Get the segmentation of a single annotation.
+
+        Args:
+            index: Position of the annotation in the annotations array
+
+        Returns:
+            Segmentation in COCO format, or None if the annotation has none
+        """
+        segmentation = self._annotations[index].get('segmentation')
+        if segmentation is None:
+            return None
+        return segmentation.as_list() if hasattr(segmentation, 'as_list') else segmentation.as_dict()
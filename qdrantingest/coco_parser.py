@@ -3,8 +3,57 @@ Parser for COCO annotation format.
 """
 
 import json
+import mmap
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import BinaryIO, Dict, List, Any, Optional
+
+import numpy as np
+
+from qdrantingest import _coco_fast
+
+# Try to import orjson for faster parsing, falling back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Try to import ijson for streaming parsing of very large files
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+REQUIRED_KEYS = ['images', 'annotations', 'categories']
+
+
+def _load_file(f: BinaryIO) -> Any:
+    """
+    Decode a JSON file, using orjson when it is available.
+    
+    With orjson the file is memory-mapped and decoded straight from the mapped
+    pages, avoiding the copy of the whole document into a bytes object.
+    
+    Args:
+        f: JSON file opened in binary mode
+        
+    Returns:
+        Decoded JSON document
+    """
+    if orjson is None:
+        return json.loads(f.read())
+    
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped
+        return orjson.loads(f.read())
+    
+    with mapped:
+        # orjson accepts memoryview but not mmap objects; release the view
+        # before the mapping is closed
+        with memoryview(mapped) as view:
+            return orjson.loads(view)
 
 
 class CocoParser:
@@ -50,14 +99,24 @@ class CocoParser:
     }
     """
     
-    def __init__(self, annotations_path: Path):
+    def __init__(self, annotations_path: Path, validate: bool = True):
         """
         Initialize the COCO parser.
         
         Args:
             annotations_path: Path to the COCO annotations JSON file.
+            validate: Whether to check that all annotations reference existing
+                      images and categories. Can be disabled for trusted files.
         """
         self.annotations_path = annotations_path
+        self.validate = validate
+        self._parsed: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._ann_by_image: Dict[int, List[Dict[str, Any]]] = {}
+        self._ann_by_category: Dict[int, List[Dict[str, Any]]] = {}
+        self._categories_by_id: Dict[int, Dict[str, Any]] = {}
+        self._soa: Optional[Dict[str, np.ndarray]] = None
+        # Set when parse_soa() read the arrays with simdjson, for get_segmentation()
+        self._fast_arrays: Optional["_coco_fast.FastAnnotationArrays"] = None
     
     def parse(self) -> Dict[str, List[Dict[str, Any]]]:
         """
@@ -68,14 +127,133 @@ class CocoParser:
             - 'images': List of image information dictionaries
             - 'annotations': List of annotation dictionaries
             - 'categories': List of category dictionaries
+        
+        The result is cached, so repeated calls do not re-read the file.
         """
+        if self._parsed is not None:
+            return self._parsed
+        
         try:
-            with open(self.annotations_path, 'r') as f:
-                coco_data = json.load(f)
+            # Read raw bytes so orjson can skip the text decoding step
+            with open(self.annotations_path, 'rb') as f:
+                coco_data = _load_file(f)
             
+            return self._load(coco_data)
+            
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON format in COCO annotations file: {self.annotations_path}")
+    
+    def parse_streaming(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Parse the COCO annotations file incrementally using ijson.
+        
+        Only the 'images', 'annotations' and 'categories' sections are
+        materialized, and the raw file contents are never held in memory,
+        which keeps peak memory low for very large annotation files.
+        
+        Returns:
+            Dict with the same structure as parse()
+            
+        Raises:
+            ImportError: If ijson is not installed
+        """
+        if self._parsed is not None:
+            return self._parsed
+        
+        if ijson is None:
+            raise ImportError(
+                "ijson package is not installed. "
+                "Please install it using: pip install ijson"
+            )
+        
+        try:
+            coco_data = {}
+            with open(self.annotations_path, 'rb') as f:
+                for key, value in ijson.kvitems(f, '', use_float=True):
+                    if key in REQUIRED_KEYS:
+                        coco_data[key] = value
+            
+            return self._load(coco_data)
+            
+        except ijson.JSONError:
+            raise ValueError(f"Invalid JSON format in COCO annotations file: {self.annotations_path}")
+    
+    def parse_soa(self) -> Dict[str, np.ndarray]:
+        """
+        Get the fixed-size annotation fields as NumPy arrays.
+        
+        The arrays share the order of parse()['annotations'] and allow vectorized
+        filtering, sorting and slicing without touching the annotation dictionaries.
+        Variable-length fields such as segmentation polygons are fetched one at a
+        time with get_segmentation().
+        
+        If the file has not been parsed yet and pysimdjson is installed, the arrays
+        are read straight from the JSON without creating the annotation dictionaries.
+        
+        Returns:
+            Dict with keys:
+            - 'ids': int64 array of annotation IDs, shape (N,)
+            - 'image_ids': int64 array of image IDs, shape (N,)
+            - 'category_ids': int64 array of category IDs, shape (N,)
+            - 'bboxes': float32 array of [x, y, width, height] boxes, shape (N, 4),
+              NaN for annotations without a bounding box
+        """
+        if self._soa is not None:
+            return self._soa
+        
+        if self._parsed is None and _coco_fast.simdjson is not None:
+            self._fast_arrays = _coco_fast.FastAnnotationArrays(
+                self.annotations_path, validate=self.validate
+            )
+            self._soa = self._fast_arrays.arrays
+            return self._soa
+        
+        annotations = self.parse()['annotations']
+        count = len(annotations)
+        missing_bbox = [float('nan')] * 4
+        
+        self._soa = {
+            'ids': np.fromiter((ann['id'] for ann in annotations), dtype=np.int64, count=count),
+            'image_ids': np.fromiter((ann['image_id'] for ann in annotations), dtype=np.int64, count=count),
+            'category_ids': np.fromiter((ann['category_id'] for ann in annotations), dtype=np.int64, count=count),
+            'bboxes': np.array(
+                [ann.get('bbox') or missing_bbox for ann in annotations], dtype=np.float32
+            ).reshape(count, 4),
+        }
+        return self._soa
+    
+    def get_segmentation(self, index: int) -> Optional[List[Any]]:
+        """
+        Get the segmentation of a single annotation.
+        
+        After parse_soa() has read the arrays with simdjson, the segmentation is
+        read lazily from the simdjson document, so the annotation dictionaries
+        are still never created.
+        
+        Args:
+            index: Position of the annotation in the parse_soa() arrays
+                   (the same as in parse()['annotations'])
+            
+        Returns:
+            Segmentation in COCO format, or None if the annotation has none
+        """
+        if self._fast_arrays is not None:
+            return self._fast_arrays.segmentation(index)
+        return self.parse()['annotations'][index].get('segmentation')
+    
+    def _load(self, coco_data: Any) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Validate decoded COCO data, build indexes and cache the result.
+        
+        Args:
+            coco_data: Decoded COCO JSON document
+            
+        Returns:
+            Dict containing the 'images', 'annotations' and 'categories' sections
+        """
+        try:
             # Extract and validate the required sections
-            required_keys = ['images', 'annotations', 'categories']
-            for key in required_keys:
+            for key in REQUIRED_KEYS:
                 if key not in coco_data:
                     raise ValueError(f"Missing required key '{key}' in COCO annotations")
             
@@ -86,23 +264,60 @@ class CocoParser:
                 'categories': coco_data['categories']
             }
             
-            # Validate that all annotations reference valid images and categories
-            image_ids = {img['id'] for img in result['images']}
-            category_ids = {cat['id'] for cat in result['categories']}
-            
-            for ann in result['annotations']:
-                if ann['image_id'] not in image_ids:
-                    raise ValueError(f"Annotation {ann['id']} references non-existent image ID {ann['image_id']}")
-                if ann['category_id'] not in category_ids:
-                    raise ValueError(f"Annotation {ann['id']} references non-existent category ID {ann['category_id']}")
+            if self.validate:
+                self._validate_references(result)
             
+            self._build_indexes(result)
+            self._parsed = result
             return result
             
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid JSON format in COCO annotations file: {self.annotations_path}")
         except KeyError as e:
             raise ValueError(f"Missing required field in COCO annotations: {e}")
     
+    def _validate_references(self, coco_data: Dict[str, List[Dict[str, Any]]]):
+        """
+        Validate that all annotations reference valid images and categories.
+        
+        Args:
+            coco_data: Dict containing the 'images', 'annotations' and 'categories' sections
+            
+        Raises:
+            ValueError: If an annotation references a non-existent image or category
+        """
+        image_ids = {img['id'] for img in coco_data['images']}
+        category_ids = {cat['id'] for cat in coco_data['categories']}
+        
+        # Compare the referenced IDs as sets so the all-valid case stays in C set code
+        annotations = coco_data['annotations']
+        missing_images = {ann['image_id'] for ann in annotations} - image_ids
+        missing_categories = {ann['category_id'] for ann in annotations} - category_ids
+        
+        if missing_images or missing_categories:
+            # Report the first offending annotation, as a per-annotation check would
+            for ann in annotations:
+                if ann['image_id'] in missing_images:
+                    raise ValueError(f"Annotation {ann['id']} references non-existent image ID {ann['image_id']}")
+                if ann['category_id'] in missing_categories:
+                    raise ValueError(f"Annotation {ann['id']} references non-existent category ID {ann['category_id']}")
+    
+    def _build_indexes(self, coco_data: Dict[str, List[Dict[str, Any]]]):
+        """
+        Build lookup indexes keyed by image ID and category ID.
+        
+        Args:
+            coco_data: Parsed COCO data as returned by parse()
+        """
+        ann_by_image = defaultdict(list)
+        ann_by_category = defaultdict(list)
+        for ann in coco_data['annotations']:
+            ann_by_image[ann['image_id']].append(ann)
+            ann_by_category[ann['category_id']].append(ann)
+        
+        # Store as plain dicts so lookups of unknown IDs don't insert empty entries
+        self._ann_by_image = dict(ann_by_image)
+        self._ann_by_category = dict(ann_by_category)
+        self._categories_by_id = {cat['id']: cat for cat in coco_data['categories']}
+    
     def get_image_annotations(self, image_id: int) -> List[Dict[str, Any]]:
         """
         Get all annotations for a specific image.
@@ -113,8 +328,8 @@ class CocoParser:
         Returns:
             List of annotation dictionaries for the specified image
         """
-        coco_data = self.parse()
-        return [ann for ann in coco_data['annotations'] if ann['image_id'] == image_id]
+        self.parse()
+        return list(self._ann_by_image.get(image_id, []))
     
     def get_category_annotations(self, category_id: int) -> List[Dict[str, Any]]:
         """
@@ -126,8 +341,8 @@ class CocoParser:
         Returns:
             List of annotation dictionaries for the specified category
         """
-        coco_data = self.parse()
-        return [ann for ann in coco_data['annotations'] if ann['category_id'] == category_id]
+        self.parse()
+        return list(self._ann_by_category.get(category_id, []))
     
     def get_category_name(self, category_id: int) -> str:
         """
@@ -142,8 +357,8 @@ class CocoParser:
         Raises:
             ValueError: If the category ID is not found
         """
-        coco_data = self.parse()
-        for category in coco_data['categories']:
-            if category['id'] == category_id:
-                return category['name']
+        self.parse()
+        category = self._categories_by_id.get(category_id)
+        if category is not None:
+            return category['name']
         raise ValueError(f"Category ID {category_id} not found")
\ No newline at end of file
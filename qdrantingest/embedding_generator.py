@@ -2,8 +2,16 @@
 Embedding generator using Jina AI.
 """
 
+import asyncio
+import base64
+import hashlib
+import io
+import logging
 import os
-from typing import List, Optional, Union, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union, Any
 
 import numpy as np
 from PIL import Image
@@ -14,6 +22,54 @@ try:
 except ImportError:
     jinaai = None
 
+# Try to import aiohttp for the async API
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Try to import lmdb for the on-disk embedding cache
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+JINA_EMBEDDINGS_URL = "https://api.jina.ai/v1/embeddings"
+
+# JPEG is much faster to encode than PNG for photos
+JPEG_QUALITY = 90
+
+# Maximum size of the on-disk embedding cache
+DISK_CACHE_MAP_SIZE = 10 * 1024 ** 3
+
+logger = logging.getLogger(__name__)
+
+# Per-thread encode buffers, reused so encoding doesn't allocate a new one per image
+_encode_buffers = threading.local()
+
+
+def _encode_image(image: Image.Image) -> bytes:
+    """
+    Encode a PIL image as JPEG bytes.
+    
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        Encoded image
+    """
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    
+    buffer = getattr(_encode_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _encode_buffers.buffer = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate(0)
+    
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
 
 class EmbeddingGenerator:
     """
@@ -27,7 +83,11 @@ class EmbeddingGenerator:
         self, 
         model_name: str = "jina-embeddings-v2-base-en",
         vector_size: int = 768,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        max_concurrent_batches: int = 5,
+        sub_batch_size: int = 32,
+        cache_size: int = 10000,
+        cache_dir: Optional[Union[str, os.PathLike]] = None
     ):
         """
         Initialize the embedding generator.
@@ -36,15 +96,62 @@ class EmbeddingGenerator:
             model_name: Name of the Jina AI model to use
             vector_size: Dimensionality of the output embeddings
             api_key: Jina AI API key (if None, will try to load from JINA_API_KEY env var)
+            max_concurrent_batches: Maximum number of API requests a call to
+                                    generate_embeddings() or agenerate_embeddings()
+                                    sends at once
+            sub_batch_size: Maximum number of images sent per API request
+            cache_size: Maximum number of embeddings kept in the in-memory cache,
+                        keyed by a hash of the encoded image (0 disables caching)
+            cache_dir: Directory of an LMDB database that persists embeddings across
+                       runs, keyed by model name and image hash (default: no disk cache)
+            
+        Raises:
+            ImportError: If cache_dir is given and lmdb is not installed
         """
         self.model_name = model_name
         self.vector_size = vector_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.sub_batch_size = sub_batch_size
+        self.cache_size = cache_size
+        
+        # LRU cache of embeddings keyed by image content hash, so identical
+        # images are only sent to the API once
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        # agenerate_embeddings() reads and fills the cache on worker threads
+        self._cache_lock = threading.Lock()
+        
+        # Optional on-disk cache shared across runs
+        self._disk_cache = None
+        if cache_dir is not None:
+            if lmdb is None:
+                raise ImportError(
+                    "lmdb package is not installed. "
+                    "Please install it using: pip install lmdb"
+                )
+            self._disk_cache = lmdb.open(str(cache_dir), map_size=DISK_CACHE_MAP_SIZE)
+        
+        # HTTP session for agenerate_embeddings(), created on first use and reused
+        # so requests share pooled keep-alive connections
+        self._session: Optional["aiohttp.ClientSession"] = None
+        # Event loop the session belongs to
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Thread pool for encoding images, created on first use. PIL releases
+        # the GIL while encoding, so images are encoded in parallel.
+        self._encode_executor: Optional[ThreadPoolExecutor] = None
+        
+        # Thread pool for concurrent API requests, created on first use
+        self._request_executor: Optional[ThreadPoolExecutor] = None
+        
+        # agenerate_embeddings() encodes on several threads at once, so the
+        # thread pools are created under a lock
+        self._executor_lock = threading.Lock()
         
         # Get API key from env var if not provided
         self.api_key = api_key or os.environ.get("JINA_API_KEY")
         
         if not self.api_key:
-            print("Warning: No Jina AI API key provided. Please set JINA_API_KEY environment variable.")
+            logger.warning("No Jina AI API key provided. Please set JINA_API_KEY environment variable.")
         
         # Check if jinaai is installed
         if jinaai is None:
@@ -76,24 +183,56 @@ class EmbeddingGenerator:
         """
         Generate embeddings for a list of images.
         
+        Images whose embedding is cached are not sent to the API. The rest are
+        sent in sub-batches of at most `sub_batch_size`, with up to
+        `max_concurrent_batches` requests in flight at once.
+        
         Args:
             images: List of PIL Image objects
             
         Returns:
-            List of embedding vectors
+            List of embedding vectors, in the same order as the input images
         """
         if not images:
             return []
         
-        # Convert PIL images to bytes
-        image_bytes = []
-        for img in images:
-            # Convert image to bytes
-            import io
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            image_bytes.append(img_byte_arr.getvalue())
+        image_bytes = self._encode_images(images)
+        keys = [self._cache_key(data) for data in image_bytes]
+        results = self._cache_lookup(keys)
+        misses = [i for i, result in enumerate(results) if result is None]
+        
+        chunks = [
+            misses[i:i + self.sub_batch_size]
+            for i in range(0, len(misses), self.sub_batch_size)
+        ]
+        
+        def embed_chunk(chunk: List[int]) -> Optional[List[List[float]]]:
+            return self._embed_chunk([image_bytes[i] for i in chunk])
         
+        if len(chunks) <= 1:
+            chunk_results = [embed_chunk(chunk) for chunk in chunks]
+        else:
+            with self._executor_lock:
+                if self._request_executor is None:
+                    self._request_executor = ThreadPoolExecutor(max_workers=self.max_concurrent_batches)
+                executor = self._request_executor
+            # map() yields results in submission order
+            chunk_results = executor.map(embed_chunk, chunks)
+        
+        for chunk, embeddings in zip(chunks, chunk_results):
+            self._fill_results(results, keys, chunk, embeddings)
+        return results
+    
+    def _embed_chunk(self, image_bytes: List[bytes]) -> Optional[List[List[float]]]:
+        """
+        Generate embeddings for one sub-batch of encoded images with a single API request.
+        
+        Args:
+            image_bytes: Encoded images
+            
+        Returns:
+            List of embedding vectors, or None if the request failed
+        """
         try:
             # Generate embeddings using Jina AI
             results = jinaai.embed(
@@ -103,17 +242,12 @@ class EmbeddingGenerator:
                 task_type="retrieval",
             ).embeddings
             
-            # Check if the dimensionality matches
-            if len(results) > 0 and len(results[0]) != self.vector_size:
-                print(f"Warning: Expected embedding dimension {self.vector_size}, "
-                      f"but got {len(results[0])}. Continuing anyway.")
-            
+            self._check_dimensions(results)
             return results
             
         except Exception as e:
-            print(f"Error generating embeddings: {e}")
-            # Return zero vectors as fallback
-            return [[0.0] * self.vector_size for _ in range(len(images))]
+            logger.error("Error generating embeddings: %s", e)
+            return None
     
     def generate_embedding(self, image: Image.Image) -> List[float]:
         """
@@ -126,4 +260,291 @@ class EmbeddingGenerator:
             Embedding vector
         """
         results = self.generate_embeddings([image])
-        return results[0] if results else [0.0] * self.vector_size
\ No newline at end of file
+        return results[0] if results else [0.0] * self.vector_size
+    
+    async def agenerate_embeddings(self, images: List[Image.Image]) -> List[List[float]]:
+        """
+        Generate embeddings for a list of images without blocking the event loop.
+        
+        Calls the Jina AI embeddings HTTP API directly, so several batches
+        can be in flight at once. Images are encoded, and the embedding cache
+        is read and written, on worker threads, so other batches and uploads
+        keep running meanwhile. Like
+        generate_embeddings(), images that are not cached are sent in
+        sub-batches of at most `sub_batch_size`, with up to
+        `max_concurrent_batches` requests in flight for the call. Requests
+        reuse one connection pool; call aclose() when done.
+        
+        Args:
+            images: List of PIL Image objects
+            
+        Returns:
+            List of embedding vectors, in the same order as the input images
+            
+        Raises:
+            ImportError: If aiohttp is not installed
+        """
+        if not images:
+            return []
+        
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp package is not installed. "
+                "Please install it using: pip install aiohttp"
+            )
+        
+        loop = asyncio.get_running_loop()
+        image_bytes = await loop.run_in_executor(None, self._encode_images, images)
+        keys = [self._cache_key(data) for data in image_bytes]
+        # The on-disk cache blocks on reads and commits, so keep it off the event loop
+        results = await loop.run_in_executor(None, self._cache_lookup, keys)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        chunks = [
+            misses[i:i + self.sub_batch_size]
+            for i in range(0, len(misses), self.sub_batch_size)
+        ]
+        
+        if self._session is not None and not self._session.closed and self._session_loop is not loop:
+            # Sessions can only be used on the event loop that created them, e.g.
+            # not across asyncio.run() calls. The old loop may already be closed,
+            # so release the session without awaiting on it.
+            self._session.detach()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            self._session_loop = loop
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        async def embed_chunk(chunk: List[int]) -> Optional[List[List[float]]]:
+            async with semaphore:
+                return await self._aembed_chunk([image_bytes[i] for i in chunk])
+        
+        # gather() returns results in submission order
+        chunk_results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+        
+        def fill_results():
+            for chunk, embeddings in zip(chunks, chunk_results):
+                self._fill_results(results, keys, chunk, embeddings)
+        
+        await loop.run_in_executor(None, fill_results)
+        return results
+    
+    async def _aembed_chunk(self, image_bytes: List[bytes]) -> Optional[List[List[float]]]:
+        """
+        Generate embeddings for one sub-batch of encoded images with a single HTTP request.
+        
+        Args:
+            image_bytes: Encoded images
+            
+        Returns:
+            List of embedding vectors, or None if the request failed
+        """
+        request_body = {
+            "model": self.model_name,
+            "input": [
+                {"image": base64.b64encode(data).decode("ascii")}
+                for data in image_bytes
+            ],
+        }
+        
+        try:
+            async with self._session.post(JINA_EMBEDDINGS_URL, json=request_body) as response:
+                response.raise_for_status()
+                data = (await response.json())["data"]
+            
+            # Results carry their input index; restore the input order
+            embeddings = [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
+            self._check_dimensions(embeddings)
+            return embeddings
+            
+        except Exception as e:
+            logger.error("Error generating embeddings: %s", e)
+            return None
+    
+    async def aclose(self):
+        """
+        Close the HTTP session used by agenerate_embeddings().
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._session_loop = None
+    
+    def close(self):
+        """
+        Release the worker threads and the on-disk cache.
+        """
+        with self._executor_lock:
+            executors = (self._encode_executor, self._request_executor)
+            self._encode_executor = None
+            self._request_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
+        
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+            self._disk_cache = None
+    
+    @staticmethod
+    def _cache_key(image_bytes: bytes) -> bytes:
+        """
+        Hash an encoded image for the embedding cache.
+        
+        Args:
+            image_bytes: Encoded image
+            
+        Returns:
+            128-bit BLAKE2b digest of the image
+        """
+        return hashlib.blake2b(image_bytes, digest_size=16).digest()
+    
+    def _cache_lookup(self, keys: List[bytes]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings in memory, then on disk.
+        
+        Args:
+            keys: Cache keys from _cache_key()
+            
+        Returns:
+            Cached embedding vector, or None if not cached, for each key
+        """
+        results = [self._cache_get(key) for key in keys]
+        if self._disk_cache is None:
+            return results
+        
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            try:
+                with self._disk_cache.begin() as txn:
+                    for i in misses:
+                        value = txn.get(self._disk_cache_key(keys[i]))
+                        if value is not None:
+                            results[i] = np.frombuffer(value, dtype=np.float32).tolist()
+                            self._cache_put(keys[i], results[i])
+            except lmdb.Error as e:
+                # Treat the remaining images as not cached
+                logger.error("Error reading embedding cache: %s", e)
+        return results
+    
+    def _disk_cache_key(self, key: bytes) -> bytes:
+        """
+        Get the on-disk cache key for an image, which also identifies the model.
+        
+        Args:
+            key: Cache key from _cache_key()
+            
+        Returns:
+            Key for the LMDB database
+        """
+        return self.model_name.encode() + b":" + key
+    
+    def _cache_get(self, key: bytes) -> Optional[List[float]]:
+        """
+        Look up a cached embedding, marking it as recently used.
+        
+        Args:
+            key: Cache key from _cache_key()
+            
+        Returns:
+            Cached embedding vector, or None if not cached
+        """
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+    
+    def _cache_put(self, key: bytes, embedding: List[float]):
+        """
+        Store an embedding in the cache, evicting the least recently used ones.
+        
+        Args:
+            key: Cache key from _cache_key()
+            embedding: Embedding vector
+        """
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _fill_results(
+        self,
+        results: List[Optional[List[float]]],
+        keys: List[bytes],
+        indices: Sequence[int],
+        embeddings: Optional[List[List[float]]]
+    ):
+        """
+        Store newly generated embeddings in the results and in the cache.
+        
+        Args:
+            results: Embeddings being assembled, in input order
+            keys: Cache keys of the inputs
+            indices: Input positions the embeddings were generated for
+            embeddings: Embeddings for `indices`, or None if the request failed,
+                        in which case zero vectors are used and nothing is cached
+        """
+        if embeddings is None:
+            # Return zero vectors as fallback
+            for i in indices:
+                results[i] = [0.0] * self.vector_size
+            return
+        
+        for i, embedding in zip(indices, embeddings):
+            results[i] = embedding
+            self._cache_put(keys[i], embedding)
+        
+        if self._disk_cache is not None:
+            # Write all new embeddings in a single transaction
+            try:
+                with self._disk_cache.begin(write=True) as txn:
+                    for i, embedding in zip(indices, embeddings):
+                        txn.put(
+                            self._disk_cache_key(keys[i]),
+                            np.asarray(embedding, dtype=np.float32).tobytes()
+                        )
+            except lmdb.Error as e:
+                # e.g. MapFullError; the embeddings are still returned
+                logger.error("Error writing embedding cache: %s", e)
+    
+    def _encode_images(self, images: List[Image.Image]) -> List[bytes]:
+        """
+        Encode PIL images as JPEG bytes for the embedding API.
+        
+        Args:
+            images: List of PIL Image objects
+            
+        Returns:
+            List of encoded images, in the same order as the input images
+        """
+        if len(images) == 1:
+            return [_encode_image(images[0])]
+        
+        with self._executor_lock:
+            if self._encode_executor is None:
+                self._encode_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+            executor = self._encode_executor
+        return list(executor.map(_encode_image, images))
+    
+    def _check_dimensions(self, results: List[List[float]]):
+        """
+        Warn if the returned embeddings don't match the configured vector size.
+        
+        Args:
+            results: Embedding vectors returned by the API
+        """
+        if len(results) > 0 and len(results[0]) != self.vector_size:
+            logger.warning(
+                "Expected embedding dimension %d, but got %d. Continuing anyway.",
+                self.vector_size, len(results[0])
+            )
\ No newline at end of file
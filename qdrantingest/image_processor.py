@@ -2,13 +2,151 @@
 Image processor for cropping objects from COCO annotated images.
 """
 
+import functools
+import logging
 import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any, Union
+from typing import Dict, Iterable, List, Tuple, Optional, Any, Union
 
 import numpy as np
 from PIL import Image, ImageDraw
 
+logger = logging.getLogger(__name__)
+
+
+# Number of decoded images kept in memory. Large enough that several crop
+# threads each working on a different image don't evict each other's images.
+IMAGE_CACHE_SIZE = 16
+
+
+@functools.lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def _open_image(image_path: str) -> Image.Image:
+    """
+    Open and decode an image, caching the most recently used ones.
+    
+    Annotations are processed sorted by image, and COCO images usually have
+    many annotations, so repeated lookups of the same file skip the disk read
+    and decode. The cached images are shared and must not be modified in place.
+    
+    Images are kept in their stored mode, so crops can be converted to RGB
+    without first converting the whole image.
+    
+    Args:
+        image_path: Path of the image file
+        
+    Returns:
+        Decoded image
+    """
+    image = Image.open(image_path)
+    image.load()
+    return image
+
+
+def _parse_polygons(segmentation: List[List[float]]) -> List[np.ndarray]:
+    """
+    Convert COCO polygons from flat coordinate lists to point arrays.
+    
+    Args:
+        segmentation: Segmentation mask in COCO format
+                      (list of polygons, each a flattened list of x,y coordinates)
+        
+    Returns:
+        Polygons with at least 3 points, as (N, 2) arrays of x,y points
+    """
+    polygons = []
+    for polygon in segmentation:
+        points = np.asarray(polygon[:len(polygon) // 2 * 2], dtype=np.float64).reshape(-1, 2)
+        if len(points) >= 3:  # Need at least 3 points for a polygon
+            polygons.append(points)
+    return polygons
+
+
+def _polygons_region(
+    polygons: List[np.ndarray], image_size: Tuple[int, int]
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Get the image region covered by a set of polygons.
+    
+    Args:
+        polygons: Polygons as (N, 2) arrays of x,y image coordinates
+        image_size: Size (width, height) of the image
+        
+    Returns:
+        Region (x0, y0, width, height) clipped to the image, or None if the
+        polygons don't overlap the image
+    """
+    if not polygons:
+        return None
+    
+    all_points = np.concatenate(polygons)
+    x0, y0 = np.maximum(np.floor(all_points.min(axis=0)), 0).astype(int).tolist()
+    x1, y1 = np.minimum(np.ceil(all_points.max(axis=0)) + 1, image_size).astype(int).tolist()
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _clamp_bboxes(bboxes: np.ndarray, image_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Convert bounding boxes to integers and clamp them to the image bounds.
+    
+    Vectorized equivalent of the clamping done by ImageProcessor._crop_by_bbox().
+    
+    Args:
+        bboxes: Array of boxes in COCO format [x, y, width, height], shape (N, 4)
+        image_size: Size (width, height) of the image
+        
+    Returns:
+        int64 array of clamped [x, y, width, height] boxes, shape (N, 4). Width
+        or height is below 1 for boxes that don't overlap the image.
+    """
+    boxes = np.trunc(bboxes).astype(np.int64)
+    boxes[:, :2] = np.maximum(boxes[:, :2], 0)
+    boxes[:, 2:] = np.minimum(boxes[:, 2:], np.asarray(image_size) - boxes[:, :2])
+    return boxes
+
+
+def _fallback_crop(image: Image.Image) -> Image.Image:
+    """
+    Get a small section of an image, used when an object cannot be cropped.
+    
+    Args:
+        image: Source image
+        
+    Returns:
+        Top-left corner of the image, at most 10x10 pixels
+    """
+    return image.crop((0, 0, min(10, image.width), min(10, image.height)))
+
+
+def _rasterize_polygons(
+    polygons: List[np.ndarray], origin: Tuple[int, int], size: Tuple[int, int]
+) -> Image.Image:
+    """
+    Rasterize filled polygons into a binary mask covering part of an image.
+    
+    Always uses PIL's ImageDraw, so masks (and the embeddings of the crops)
+    don't depend on which optional packages are installed. cv2.fillPoly
+    also fills every pixel its edges touch, giving different edge pixels,
+    and is not measurably faster on masks sized to the polygons.
+    
+    Args:
+        polygons: Polygons as (N, 2) arrays of x,y image coordinates
+        origin: Image coordinates (x, y) of the mask's top-left pixel
+        size: Size (width, height) of the mask
+        
+    Returns:
+        Mask image in mode 'L', 255 inside the polygons and 0 elsewhere
+    """
+    mask = Image.new('L', size, 0)
+    draw = ImageDraw.Draw(mask)
+    for points in polygons:
+        draw.polygon((points - origin).ravel().tolist(), fill=255)
+    return mask
+
 
 class ImageProcessor:
     """
@@ -18,7 +156,12 @@ class ImageProcessor:
     bounding boxes or segmentation masks from COCO annotations.
     """
     
-    def __init__(self, images_dir: Union[str, Path], use_segmentation: bool = False):
+    def __init__(
+        self,
+        images_dir: Union[str, Path],
+        use_segmentation: bool = False,
+        num_workers: int = 4
+    ):
         """
         Initialize the image processor.
         
@@ -26,31 +169,99 @@ class ImageProcessor:
             images_dir: Directory containing the source images
             use_segmentation: Whether to use segmentation masks for cropping (if available)
                               instead of bounding boxes
+            num_workers: Number of threads process_batch() uses to process
+                         different images in parallel
         """
         self.images_dir = Path(images_dir)
         self.use_segmentation = use_segmentation
+        self.num_workers = num_workers
+        
+        # Thread pool for process_batch(), created on first use. Batches may be
+        # processed from several threads at once, so it is created under a lock.
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Get the state for pickling, without the thread pool and its lock, so
+        the processor can be sent to worker processes.
+        """
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        del state['_executor_lock']
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]):
+        """
+        Restore a pickled processor with a new lock for its thread pool.
+        """
+        self.__dict__.update(state)
+        self._executor_lock = threading.Lock()
+    
+    def close(self):
+        """
+        Release the worker threads used by process_batch().
+        """
+        with self._executor_lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown()
     
-    def load_image(self, image_filename: str) -> Optional[Image.Image]:
+    def load_image(self, image_filename: str, convert: bool = True) -> Optional[Image.Image]:
         """
         Load an image from the images directory.
         
         Args:
             image_filename: Filename of the image to load
+            convert: Whether to return an RGB copy of the image. Cropping code
+                     passes False to get the shared cached image, which must not
+                     be modified in place, and converts only the cropped region.
             
         Returns:
             Loaded PIL Image or None if the image could not be loaded
         """
         image_path = self.images_dir / image_filename
         if not image_path.exists():
-            print(f"Warning: Image not found: {image_path}")
+            logger.warning("Image not found: %s", image_path)
             return None
         
         try:
-            return Image.open(image_path).convert("RGB")
+            image = _open_image(str(image_path))
+            if convert:
+                # Never hand the cached image itself to callers
+                image = image.convert("RGB") if image.mode != "RGB" else image.copy()
+            return image
         except Exception as e:
-            print(f"Error loading image {image_path}: {e}")
+            logger.error("Error loading image %s: %s", image_path, e)
             return None
     
+    def prefetch(self, image_filenames: Iterable[str]):
+        """
+        Ask the OS to start reading image files into the page cache.
+        
+        The reads happen asynchronously in the kernel, so many files can be
+        requested at once and a later load_image() doesn't wait on the disk.
+        This matters most for high-latency storage such as network drives.
+        Does nothing on platforms without posix_fadvise().
+        
+        Args:
+            image_filenames: Filenames of the images that will be loaded soon
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        
+        for image_filename in image_filenames:
+            try:
+                fd = os.open(self.images_dir / image_filename, os.O_RDONLY)
+            except OSError:
+                # Missing files are reported when they are loaded
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+    
     def crop_object(
         self, 
         image_filename: str, 
@@ -69,40 +280,152 @@ class ImageProcessor:
         Returns:
             Cropped PIL Image or None if cropping failed
         """
-        image = self.load_image(image_filename)
+        image = self.load_image(image_filename, convert=False)
         if image is None:
             return None
         
+        return self._crop(image, image_filename, bbox, segmentation)
+    
+    def crop_objects_batch(
+        self,
+        image_filename: str,
+        objects: List[Tuple[Optional[List[float]], Optional[List[List[float]]]]]
+    ) -> List[Optional[Image.Image]]:
+        """
+        Crop several objects from the same image, loading the image only once.
+        
+        Args:
+            image_filename: Filename of the image to crop from
+            objects: List of (bbox, segmentation) pairs in the format accepted
+                     by crop_object()
+            
+        Returns:
+            List with a cropped PIL Image, or None if cropping failed, for each object
+        """
+        image = self.load_image(image_filename, convert=False)
+        if image is None:
+            return [None] * len(objects)
+        
+        # Clamp all bounding boxes to the image in one vectorized step
+        bboxes = [bbox for bbox, _ in objects]
+        with_bbox = [i for i, bbox in enumerate(bboxes) if bbox and len(bbox) == 4]
+        if with_bbox:
+            clamped = _clamp_bboxes(np.array([bboxes[i] for i in with_bbox], dtype=np.float64), image.size)
+            for i, bbox in zip(with_bbox, clamped.tolist()):
+                bboxes[i] = bbox
+        
+        return [
+            self._crop(image, image_filename, bbox, segmentation, clamped=True)
+            for bbox, (_, segmentation) in zip(bboxes, objects)
+        ]
+    
+    def process_batch(
+        self,
+        items: List[Tuple[str, Optional[List[float]], Optional[List[List[float]]]]],
+        target_size: Tuple[int, int] = (224, 224)
+    ) -> List[Optional[Image.Image]]:
+        """
+        Crop and preprocess objects from several images in parallel.
+        
+        Objects are grouped by image, so each image is decoded once, and the
+        images are processed on a thread pool of `num_workers` threads. PIL
+        releases the GIL while decoding and resizing.
+        
+        Args:
+            items: List of (image_filename, bbox, segmentation) tuples in the
+                   format accepted by crop_object()
+            target_size: Size to resize the cropped objects to
+            
+        Returns:
+            List with a preprocessed PIL Image, or None if cropping failed, for
+            each item, in the same order as the items
+        """
+        items_by_image = defaultdict(list)
+        for index, (image_filename, _, _) in enumerate(items):
+            items_by_image[image_filename].append(index)
+        
+        def process_image(image_filename: str, indices: List[int]) -> List[Optional[Image.Image]]:
+            cropped_images = self.crop_objects_batch(
+                image_filename, [(items[i][1], items[i][2]) for i in indices]
+            )
+            return [
+                self.preprocess_image(cropped, target_size) if cropped is not None else None
+                for cropped in cropped_images
+            ]
+        
+        if self.num_workers > 1 and len(items_by_image) > 1:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.num_workers)
+                executor = self._executor
+            processed = executor.map(process_image, items_by_image.keys(), items_by_image.values())
+        else:
+            processed = map(process_image, items_by_image.keys(), items_by_image.values())
+        
+        results: List[Optional[Image.Image]] = [None] * len(items)
+        for indices, images in zip(items_by_image.values(), processed):
+            for index, image in zip(indices, images):
+                results[index] = image
+        return results
+    
+    def _crop(
+        self,
+        image: Image.Image,
+        image_filename: str,
+        bbox: Optional[List[float]],
+        segmentation: Optional[List[List[float]]],
+        clamped: bool = False
+    ) -> Optional[Image.Image]:
+        """
+        Crop an object from a loaded image using either bounding box or segmentation mask.
+        
+        Args:
+            image: Source image, in any mode
+            image_filename: Filename of the source image (used in warnings)
+            bbox: Bounding box in COCO format [x, y, width, height]
+            segmentation: Segmentation mask in COCO format
+            clamped: Whether the bounding box was already clamped with _clamp_bboxes()
+            
+        Returns:
+            Cropped PIL Image or None if cropping failed
+        """
         # Use segmentation if available and requested
         if self.use_segmentation and segmentation and len(segmentation) > 0:
-            return self._crop_by_segmentation(image, segmentation)
+            cropped = self._crop_by_segmentation(image, segmentation)
         elif bbox and len(bbox) == 4:
-            return self._crop_by_bbox(image, bbox)
+            cropped = self._crop_by_bbox(image, bbox, clamped)
         else:
-            print(f"Warning: No valid bbox or segmentation found for {image_filename}")
+            logger.warning("No valid bbox or segmentation found for %s", image_filename)
             return None
+        
+        # The source image may be in any mode; convert only the cropped region
+        if cropped.mode != "RGB":
+            cropped = cropped.convert("RGB")
+        return cropped
     
-    def _crop_by_bbox(self, image: Image.Image, bbox: List[float]) -> Image.Image:
+    def _crop_by_bbox(self, image: Image.Image, bbox: List[float], clamped: bool = False) -> Image.Image:
         """
         Crop an object using a bounding box.
         
         Args:
             image: Source image
             bbox: Bounding box in COCO format [x, y, width, height]
+            clamped: Whether the bounding box was already clamped with _clamp_bboxes()
             
         Returns:
             Cropped image
         """
         x, y, width, height = bbox
-        # Convert to integers and ensure within image bounds
-        x = max(0, int(x))
-        y = max(0, int(y))
-        width = min(int(width), image.width - x)
-        height = min(int(height), image.height - y)
+        if not clamped:
+            # Convert to integers and ensure within image bounds
+            x = max(0, int(x))
+            y = max(0, int(y))
+            width = min(int(width), image.width - x)
+            height = min(int(height), image.height - y)
         
         # Ensure minimum size
         if width < 1 or height < 1:
-            print(f"Warning: Invalid bbox size: {width}x{height}")
+            logger.warning("Invalid bbox size: %dx%d", width, height)
             # Return a small portion of the image to avoid errors
             return image.crop((0, 0, min(10, image.width), min(10, image.height)))
         
@@ -122,44 +445,49 @@ class ImageProcessor:
         Returns:
             Cropped image with mask applied
         """
-        # Create a binary mask from the segmentation
-        mask = Image.new('L', (image.width, image.height), 0)
-        draw = ImageDraw.Draw(mask)
+        # Rasterize into a buffer covering only the polygons, not the whole image
+        polygons = _parse_polygons(segmentation)
+        region = _polygons_region(polygons, image.size)
+        if region is None:
+            return _fallback_crop(image)
         
-        for polygon in segmentation:
-            # Convert flat list to list of (x,y) tuples
-            points = []
-            for i in range(0, len(polygon), 2):
-                if i + 1 < len(polygon):
-                    points.append((polygon[i], polygon[i + 1]))
-            
-            if len(points) >= 3:  # Need at least 3 points for a polygon
-                draw.polygon(points, fill=255)
+        x0, y0, width, height = region
+        mask = _rasterize_polygons(polygons, (x0, y0), (width, height))
+        return self._apply_mask(image, mask, (x0, y0))
+    
+    def _apply_mask(
+        self, image: Image.Image, mask: Image.Image, origin: Tuple[int, int]
+    ) -> Image.Image:
+        """
+        Crop an image to a mask and black out the pixels outside the mask.
         
+        Args:
+            image: Source image
+            mask: Mask image in mode 'L' covering part of the source image
+            origin: Image coordinates (x, y) of the mask's top-left pixel
+            
+        Returns:
+            Image cropped to the bounding box of the mask, with mask applied
+        """
         # Find the bounding box of the mask
         bbox = mask.getbbox()
         if not bbox:
             # Fallback to a small section if mask is empty
-            return image.crop((0, 0, min(10, image.width), min(10, image.height)))
+            return _fallback_crop(image)
         
         # Create a cropped version of both the image and mask
-        cropped_image = image.crop(bbox)
+        x0, y0 = origin
+        left, top, right, bottom = bbox
+        cropped_image = image.crop((x0 + left, y0 + top, x0 + right, y0 + bottom))
         cropped_mask = mask.crop(bbox)
         
-        # Apply the mask to the cropped image
-        # Convert to RGBA to support transparency
-        result = Image.new('RGBA', cropped_image.size, (0, 0, 0, 0))
-        cropped_image = cropped_image.convert('RGBA')
-        
-        # Composite the image with the mask
-        for x in range(cropped_image.width):
-            for y in range(cropped_image.height):
-                mask_value = cropped_mask.getpixel((x, y))
-                if mask_value > 0:  # If mask is non-zero at this pixel
-                    result.putpixel((x, y), cropped_image.getpixel((x, y)))
-        
-        # Convert back to RGB for compatibility with embedding models
-        return result.convert('RGB')
+        # Apply the mask to the cropped image in a single array operation,
+        # blacking out the pixels outside the mask
+        if cropped_image.mode != 'RGB':
+            cropped_image = cropped_image.convert('RGB')
+        image_array = np.array(cropped_image)
+        image_array[np.asarray(cropped_mask) == 0] = 0
+        return Image.fromarray(image_array, 'RGB')
     
     def preprocess_image(self, image: Image.Image, target_size: Tuple[int, int] = (224, 224)) -> Image.Image:
         """
@@ -172,5 +500,7 @@ class ImageProcessor:
         Returns:
             Preprocessed image
         """
-        # Resize the image to the target size
-        return image.resize(target_size, Image.Resampling.LANCZOS)
\ No newline at end of file
+        # Resize the image to the target size. BILINEAR is several times faster
+        # than LANCZOS, and reducing_gap first shrinks large images by an
+        # integer factor with a cheap box reduction.
+        return image.resize(target_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
\ No newline at end of file
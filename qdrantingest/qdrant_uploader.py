@@ -2,13 +2,34 @@
 Uploader for storing embeddings in QDrant vector database.
 """
 
+import asyncio
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Union, Any
 
 import numpy as np
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
 
 
+def _build_batch(objects: List[Dict[str, Any]]) -> models.Batch:
+    """
+    Convert upload objects into a columnar QDrant batch.
+    
+    Args:
+        objects: List of dictionaries with 'id', 'vector' and 'payload' keys
+        
+    Returns:
+        QDrant batch holding the IDs, vectors and payloads of all objects
+    """
+    return models.Batch(
+        ids=[obj['id'] for obj in objects],
+        vectors=[obj['vector'] for obj in objects],
+        payloads=[obj['payload'] for obj in objects]
+    )
+
+
 class QdrantUploader:
     """
     Uploader for storing embeddings in QDrant vector database.
@@ -24,7 +45,11 @@ class QdrantUploader:
         path: Optional[str] = None,
         url: Optional[str] = None,
         api_key: Optional[str] = None,
-        distance: str = "Cosine"
+        distance: str = "Cosine",
+        defer_indexing: bool = True,
+        prefer_grpc: bool = False,
+        wait: bool = False,
+        quantize: bool = True
     ):
         """
         Initialize the QDrant uploader.
@@ -36,16 +61,56 @@ class QdrantUploader:
             url: URL of the QDrant server (for remote storage)
             api_key: API key for QDrant server (if using cloud service)
             distance: Distance function to use (Cosine, Euclid, or Dot)
+            defer_indexing: Whether to disable vector indexing on newly created
+                            collections until finalize() is called, so the server
+                            does not keep rebuilding the HNSW graph during bulk loads.
+                            Callers must call finalize() once uploading is done,
+                            even if it failed, or the collection stays unindexed.
+            prefer_grpc: Whether to talk to a remote server over gRPC instead of REST,
+                         which has lower overhead for bulk uploads
+            wait: Whether uploads wait for the server to apply each batch. Without
+                  waiting, the next batch can be sent while the server is still
+                  indexing the previous one.
+            quantize: Whether newly created collections keep an int8 scalar-quantized
+                      copy of the vectors in RAM for search. This uses a quarter
+                      of the memory of float32 vectors with little loss of recall;
+                      the original vectors are kept for rescoring.
         """
         self.collection_name = collection_name
         self.vector_size = vector_size
         self.distance = distance
+        self.defer_indexing = defer_indexing
+        self.url = url
+        self.api_key = api_key
+        self.prefer_grpc = prefer_grpc
+        self.wait = wait
+        self.quantize = quantize
+        
+        # Created lazily by aupload_batch()
+        self._async_client: Optional[AsyncQdrantClient] = None
+        self._upload_executor: Optional[ThreadPoolExecutor] = None
+        
+        # Set once the collection is known to exist; collections are not
+        # expected to disappear during a run, so the check is not repeated
+        self._collection_ready = False
+        
+        # Whether the collection was created by this uploader, rather than
+        # already existing
+        self.created_collection = False
+        
+        # Set when this uploader created the collection with indexing disabled,
+        # so finalize() only re-enables indexing on collections it deferred
+        self._indexing_deferred = False
+        
+        # Filters built by search(), keyed by their conditions
+        self._filter_cache: Dict[frozenset, models.Filter] = {}
         
         # Initialize client (either local or remote)
         if url:
             self.client = QdrantClient(
                 url=url,
-                api_key=api_key
+                api_key=api_key,
+                prefer_grpc=prefer_grpc
             )
         else:
             self.client = QdrantClient(
@@ -70,6 +135,19 @@ class QdrantUploader:
                 vectors_config=models.VectorParams(
                     size=self.vector_size,
                     distance=self.distance
+                ),
+                optimizers_config=(
+                    models.OptimizersConfigDiff(indexing_threshold=0)
+                    if self.defer_indexing else None
+                ),
+                quantization_config=(
+                    models.ScalarQuantization(
+                        scalar=models.ScalarQuantizationConfig(
+                            type=models.ScalarType.INT8,
+                            always_ram=True
+                        )
+                    )
+                    if self.quantize else None
                 )
             )
             
@@ -86,7 +164,33 @@ class QdrantUploader:
                 field_schema=models.PayloadSchemaType.INTEGER
             )
             
+            self.created_collection = True
+            self._indexing_deferred = self.defer_indexing
+            
             print(f"Created collection '{self.collection_name}' with vector size {self.vector_size}")
+        
+        self._collection_ready = True
+    
+    def finalize(self, indexing_threshold: int = 20000):
+        """
+        Re-enable vector indexing once the bulk load is complete.
+        
+        Does nothing unless this uploader created the collection with indexing
+        deferred, so the settings of pre-existing collections are left alone.
+        
+        Args:
+            indexing_threshold: Indexing threshold (in kilobytes) to restore
+        """
+        if not self._indexing_deferred:
+            return
+        
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=models.OptimizersConfigDiff(
+                indexing_threshold=indexing_threshold
+            )
+        )
+        self._indexing_deferred = False
     
     def collection_exists(self) -> bool:
         """
@@ -95,9 +199,13 @@ class QdrantUploader:
         Returns:
             True if the collection exists, False otherwise
         """
+        if self._collection_ready:
+            return True
+        
         collections = self.client.get_collections().collections
         collection_names = [collection.name for collection in collections]
-        return self.collection_name in collection_names
+        self._collection_ready = self.collection_name in collection_names
+        return self._collection_ready
     
     def upload_batch(self, objects: List[Dict[str, Any]]):
         """
@@ -112,23 +220,54 @@ class QdrantUploader:
         if not objects:
             return
         
-        # Prepare points for upload
-        points = []
-        for obj in objects:
-            points.append(
-                models.PointStruct(
-                    id=obj['id'],
-                    vector=obj['vector'],
-                    payload=obj['payload']
-                )
-            )
-        
         # Upload points in batches
         self.client.upsert(
             collection_name=self.collection_name,
-            points=points
+            points=_build_batch(objects),
+            wait=self.wait
         )
     
+    async def aupload_batch(self, objects: List[Dict[str, Any]]):
+        """
+        Upload a batch of objects to QDrant without blocking the event loop.
+        
+        Remote servers are written to with an AsyncQdrantClient. Local storage
+        can only be opened by a single client, so local uploads run the sync
+        client on a dedicated worker thread instead.
+        
+        Args:
+            objects: List of dictionaries in the format accepted by upload_batch()
+        """
+        if not objects:
+            return
+        
+        if self.url:
+            if self._async_client is None:
+                self._async_client = AsyncQdrantClient(
+                    url=self.url, api_key=self.api_key, prefer_grpc=self.prefer_grpc
+                )
+            await self._async_client.upsert(
+                collection_name=self.collection_name,
+                points=_build_batch(objects),
+                wait=self.wait
+            )
+        else:
+            if self._upload_executor is None:
+                self._upload_executor = ThreadPoolExecutor(max_workers=1)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._upload_executor, self.upload_batch, objects)
+    
+    async def aclose(self):
+        """
+        Release the resources used by aupload_batch().
+        """
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._upload_executor is not None:
+            self._upload_executor.shutdown()
+            self._upload_executor = None
+    
     def search(
         self,
         query_vector: List[float],
@@ -149,15 +288,7 @@ class QdrantUploader:
         # Create filter if provided
         filter_obj = None
         if filter_conditions:
-            filter_obj = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key=key,
-                        match=models.MatchValue(value=value)
-                    )
-                    for key, value in filter_conditions.items()
-                ]
-            )
+            filter_obj = self._get_filter(filter_conditions)
         
         # Perform search
         search_result = self.client.search(
@@ -176,4 +307,168 @@ class QdrantUploader:
                 'payload': scored_point.payload
             })
         
-        return results
\ No newline at end of file
+        return results
+    
+    def _get_filter(self, filter_conditions: Dict[str, Any]) -> models.Filter:
+        """
+        Get a filter matching all conditions, reusing filters built before.
+        
+        Args:
+            filter_conditions: Mapping of payload field names to required values
+            
+        Returns:
+            QDrant filter
+        """
+        # MatchValue only accepts scalar values, so the conditions are hashable
+        key = frozenset(filter_conditions.items())
+        filter_obj = self._filter_cache.get(key)
+        if filter_obj is None:
+            filter_obj = models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key=field,
+                        match=models.MatchValue(value=value)
+                    )
+                    for field, value in filter_conditions.items()
+                ]
+            )
+            self._filter_cache[key] = filter_obj
+        return filter_obj
+
+
+def _parallel_upload_worker(
+    queue: multiprocessing.Queue,
+    collection_name: str,
+    url: str,
+    api_key: Optional[str],
+    prefer_grpc: bool,
+    wait: bool
+):
+    """
+    Upload batches from a queue until a None sentinel is received.
+    
+    Args:
+        queue: Queue of upload object batches
+        collection_name: Name of the collection to upload to
+        url: URL of the QDrant server
+        api_key: API key for QDrant server
+        prefer_grpc: Whether to talk to the server over gRPC
+        wait: Whether uploads wait for the server to apply each batch
+    """
+    client = QdrantClient(url=url, api_key=api_key, prefer_grpc=prefer_grpc)
+    while True:
+        objects = queue.get()
+        if objects is None:
+            break
+        client.upsert(collection_name=collection_name, points=_build_batch(objects), wait=wait)
+
+
+class ParallelUploader:
+    """
+    Uploader that spreads batches over several uploader processes.
+    
+    Each process holds its own connection to a remote QDrant server and
+    consumes batches from a shared queue. The collection must already exist,
+    e.g. by creating a QdrantUploader first.
+    """
+    
+    def __init__(
+        self,
+        collection_name: str,
+        url: str,
+        api_key: Optional[str] = None,
+        num_workers: int = 4,
+        prefer_grpc: bool = False,
+        wait: bool = False
+    ):
+        """
+        Start the uploader processes.
+        
+        Args:
+            collection_name: Name of the collection to upload to
+            url: URL of the QDrant server
+            api_key: API key for QDrant server (if using cloud service)
+            num_workers: Number of uploader processes
+            prefer_grpc: Whether to talk to the server over gRPC instead of REST
+            wait: Whether uploads wait for the server to apply each batch
+        """
+        self.collection_name = collection_name
+        self._queue = multiprocessing.Queue(maxsize=2 * num_workers)
+        self._workers = [
+            multiprocessing.Process(
+                target=_parallel_upload_worker,
+                args=(self._queue, collection_name, url, api_key, prefer_grpc, wait),
+                daemon=True
+            )
+            for _ in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def upload_batch(self, objects: List[Dict[str, Any]]):
+        """
+        Queue a batch of objects for upload.
+        
+        Args:
+            objects: List of dictionaries in the format accepted by
+                QdrantUploader.upload_batch()
+        """
+        if objects:
+            self._put(objects)
+    
+    async def aupload_batch(self, objects: List[Dict[str, Any]]):
+        """
+        Queue a batch of objects for upload without blocking the event loop.
+        
+        Args:
+            objects: List of dictionaries in the format accepted by
+                QdrantUploader.upload_batch()
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.upload_batch, objects)
+    
+    async def aclose(self):
+        """
+        Wait for queued batches to be uploaded without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+    
+    def close(self):
+        """
+        Wait for queued batches to be uploaded and stop the uploader processes.
+        
+        Raises:
+            RuntimeError: If an uploader process failed
+        """
+        for _ in self._workers:
+            # Workers exit as they receive a sentinel, so only stop once none are left
+            while any(worker.is_alive() for worker in self._workers):
+                try:
+                    self._queue.put(None, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+        for worker in self._workers:
+            worker.join()
+        if any(worker.exitcode != 0 for worker in self._workers):
+            raise RuntimeError("A QDrant uploader process exited unexpectedly")
+    
+    def _put(self, item: Optional[List[Dict[str, Any]]]):
+        """
+        Put an item on the queue, failing if an uploader process has died.
+        
+        Args:
+            item: Batch of upload objects, or None to stop a worker
+            
+        Raises:
+            RuntimeError: If an uploader process exited unexpectedly
+        """
+        while True:
+            if not all(worker.is_alive() for worker in self._workers):
+                raise RuntimeError("A QDrant uploader process exited unexpectedly")
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
\ No newline at end of file
@@ -9,6 +9,9 @@ from pathlib import Path
 import unittest
 from unittest.mock import patch, mock_open
 
+import numpy as np
+
+from qdrantingest import _coco_fast, coco_parser
 from qdrantingest.coco_parser import CocoParser
 
 
@@ -137,6 +140,95 @@ class TestCocoParser(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.parser.get_category_name(999)
     
+    def test_parse_is_cached(self):
+        """Test that repeated lookups do not re-read the annotations file."""
+        result = self.parser.parse()
+        
+        with patch('builtins.open', side_effect=AssertionError("file re-read")):
+            self.assertIs(self.parser.parse(), result)
+            self.assertEqual(len(self.parser.get_image_annotations(1)), 2)
+            self.assertEqual(len(self.parser.get_category_annotations(1)), 2)
+            self.assertEqual(self.parser.get_category_name(2), "car")
+    
+    def test_parse_soa(self):
+        """Test getting annotation fields as NumPy arrays."""
+        soa = self.parser.parse_soa()
+        
+        np.testing.assert_array_equal(soa['ids'], [1, 2, 3])
+        np.testing.assert_array_equal(soa['image_ids'], [1, 1, 2])
+        np.testing.assert_array_equal(soa['category_ids'], [1, 2, 1])
+        self.assertEqual(soa['bboxes'].shape, (3, 4))
+        self.assertEqual(soa['bboxes'].dtype, np.float32)
+        np.testing.assert_array_equal(soa['bboxes'][2], [50, 60, 120, 180])
+    
+    def test_parse_soa_without_simdjson(self):
+        """Test getting annotation arrays from the parsed dictionaries."""
+        with patch.object(_coco_fast, 'simdjson', None):
+            soa = CocoParser(self.coco_file).parse_soa()
+        
+        np.testing.assert_array_equal(soa['image_ids'], [1, 1, 2])
+        np.testing.assert_array_equal(soa['bboxes'][0], [10, 20, 100, 200])
+    
+    def test_get_segmentation(self):
+        """Test getting segmentations by annotation position, with and without simdjson."""
+        data = json.loads(json.dumps(self.sample_coco_data))
+        data['annotations'][1]['segmentation'] = [[150.5, 160, 250, 160, 200, 260]]
+        seg_file = self.temp_path / "segmentation.json"
+        with open(seg_file, 'w') as f:
+            json.dump(data, f)
+        
+        expected = [None, [[150.5, 160, 250, 160, 200, 260]], None]
+        
+        with patch.object(_coco_fast, 'simdjson', None):
+            parser = CocoParser(seg_file)
+            parser.parse_soa()
+            self.assertEqual([parser.get_segmentation(i) for i in range(3)], expected)
+        
+        if _coco_fast.simdjson is None:
+            self.skipTest("pysimdjson not installed")
+        
+        # The fast path reads the segmentations from the simdjson document
+        parser = CocoParser(seg_file)
+        parser.parse_soa()
+        with patch.object(parser, 'parse', side_effect=AssertionError("dictionaries created")):
+            self.assertEqual([parser.get_segmentation(i) for i in range(3)], expected)
+    
+    @unittest.skipIf(_coco_fast.simdjson is None, "pysimdjson not installed")
+    def test_fast_annotation_arrays(self):
+        """Test the simdjson fast path matches the dictionary-based arrays."""
+        fast = _coco_fast.FastAnnotationArrays(self.coco_file)
+        self.parser.parse()
+        expected = self.parser.parse_soa()
+        
+        for key, array in expected.items():
+            np.testing.assert_array_equal(fast.arrays[key], array)
+            self.assertEqual(fast.arrays[key].dtype, array.dtype)
+        self.assertIsNone(fast.segmentation(0))
+        
+        # Invalid references are reported like CocoParser does
+        bad_data = json.loads(json.dumps(self.sample_coco_data))
+        bad_data['annotations'][2]['category_id'] = 99
+        bad_file = self.temp_path / "bad.json"
+        with open(bad_file, 'w') as f:
+            json.dump(bad_data, f)
+        
+        with self.assertRaisesRegex(ValueError, "Annotation 3 .*category ID 99"):
+            _coco_fast.FastAnnotationArrays(bad_file)
+    
+    def test_parse_without_orjson(self):
+        """Test parsing falls back to the stdlib json module."""
+        with patch.object(coco_parser, 'orjson', None):
+            result = CocoParser(self.coco_file).parse()
+        
+        self.assertEqual(result['annotations'], self.sample_coco_data['annotations'])
+    
+    @unittest.skipIf(coco_parser.ijson is None, "ijson not installed")
+    def test_parse_streaming(self):
+        """Test streaming parsing produces the same result as parse()."""
+        result = CocoParser(self.coco_file).parse_streaming()
+        
+        self.assertEqual(result, self.parser.parse())
+    
     def test_invalid_json(self):
         """Test handling of invalid JSON file."""
         # Create an invalid JSON file
@@ -148,6 +240,23 @@ class TestCocoParser(unittest.TestCase):
         with self.assertRaises(ValueError):
             parser.parse()
     
+    def test_invalid_references(self):
+        """Test handling of annotations referencing unknown images or categories."""
+        for field, message in (('image_id', "image ID 99"), ('category_id', "category ID 99")):
+            bad_data = json.loads(json.dumps(self.sample_coco_data))
+            bad_data['annotations'][1][field] = 99
+            
+            bad_file = self.temp_path / f"bad_{field}.json"
+            with open(bad_file, 'w') as f:
+                json.dump(bad_data, f)
+            
+            with self.assertRaisesRegex(ValueError, f"Annotation 2 .*{message}"):
+                CocoParser(bad_file).parse()
+            
+            # Validation can be skipped for trusted files
+            result = CocoParser(bad_file, validate=False).parse()
+            self.assertEqual(len(result['annotations']), 3)
+    
     def test_missing_required_key(self):
         """Test handling of COCO file with missing required key."""
         # Create a COCO file without annotations
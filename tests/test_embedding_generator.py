@@ -0,0 +1,251 @@
+"""
+Tests for the embedding generator module.
+"""
+
+import asyncio
+import base64
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from PIL import Image
+
+from qdrantingest import embedding_generator
+from qdrantingest.embedding_generator import EmbeddingGenerator, _encode_image
+
+
+class FakeResponse:
+    """Response of FakeSession.post()."""
+    
+    def __init__(self, data):
+        self._data = data
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    def raise_for_status(self):
+        pass
+    
+    async def json(self):
+        return {"data": self._data}
+
+
+class FakeSession:
+    """Stand-in for aiohttp.ClientSession returning results in reverse order."""
+    
+    closed = False
+    
+    def __init__(self, embed):
+        self._embed = embed
+        self.request_sizes = []
+    
+    def post(self, url, json):
+        inputs = [base64.b64decode(item["image"]) for item in json["input"]]
+        self.request_sizes.append(len(inputs))
+        data = [
+            {"index": i, "embedding": embedding}
+            for i, embedding in enumerate(self._embed(inputs))
+        ]
+        return FakeResponse(data[::-1])
+    
+    async def close(self):
+        pass
+
+
+class TestEmbeddingGenerator(unittest.TestCase):
+    """Test cases for the EmbeddingGenerator class."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        
+        # Distinct test images, and the embedding the fake API returns for each
+        self.images = [Image.new('RGB', (16, 16), color=(i * 40, 0, 0)) for i in range(6)]
+        self.index_by_bytes = {_encode_image(image): i for i, image in enumerate(self.images)}
+        self.requests = []
+        self.failing_index = None
+        
+        # Patch the Jina AI client
+        jinaai_patcher = patch.object(embedding_generator, 'jinaai', MagicMock())
+        self.mock_jinaai = jinaai_patcher.start()
+        self.addCleanup(jinaai_patcher.stop)
+        self.mock_jinaai.embed.side_effect = self._fake_embed
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def _embeddings(self, inputs):
+        """Embeddings of encoded images: the image's index, repeated."""
+        indices = [self.index_by_bytes[data] for data in inputs]
+        self.requests.append(indices)
+        if self.failing_index in indices:
+            raise RuntimeError("request failed")
+        return [[float(i)] * 4 for i in indices]
+    
+    def _fake_embed(self, model, inputs, input_type, task_type):
+        return SimpleNamespace(embeddings=self._embeddings(inputs))
+    
+    def _generator(self, **kwargs):
+        return EmbeddingGenerator(vector_size=4, api_key="test-key", **kwargs)
+    
+    def test_generate_embeddings_in_order(self):
+        """Test that sub-batch results are returned in input order."""
+        generator = self._generator(sub_batch_size=2)
+        
+        results = generator.generate_embeddings(self.images[:5])
+        generator.close()
+        
+        self.assertEqual(results, [[float(i)] * 4 for i in range(5)])
+        self.assertEqual(sorted(self.requests), [[0, 1], [2, 3], [4]])
+    
+    def test_only_misses_are_sent(self):
+        """Test that cached images are not sent to the API again."""
+        generator = self._generator(sub_batch_size=2)
+        generator.generate_embeddings(self.images[:3])
+        self.requests.clear()
+        
+        results = generator.generate_embeddings([self.images[4], self.images[1], self.images[3]])
+        generator.close()
+        
+        self.assertEqual(results, [[4.0] * 4, [1.0] * 4, [3.0] * 4])
+        self.assertEqual(self.requests, [[4, 3]])
+    
+    def test_failed_sub_batch_is_not_cached(self):
+        """Test that a failed request returns zero vectors that are not cached."""
+        generator = self._generator(sub_batch_size=2)
+        self.failing_index = 2
+        
+        results = generator.generate_embeddings(self.images[:4])
+        self.assertEqual(results, [[0.0] * 4, [1.0] * 4, [0.0] * 4, [0.0] * 4])
+        
+        # The failed images are sent again
+        self.failing_index = None
+        self.requests.clear()
+        results = generator.generate_embeddings(self.images[:4])
+        generator.close()
+        
+        self.assertEqual(results, [[float(i)] * 4 for i in range(4)])
+        self.assertEqual(self.requests, [[2, 3]])
+    
+    def test_cache_eviction(self):
+        """Test that the least recently used embeddings are evicted."""
+        generator = self._generator(cache_size=2)
+        generator._cache_put(b"a", [1.0])
+        generator._cache_put(b"b", [2.0])
+        
+        # Looking up "a" makes "b" the least recently used
+        self.assertEqual(generator._cache_get(b"a"), [1.0])
+        generator._cache_put(b"c", [3.0])
+        
+        self.assertIsNone(generator._cache_get(b"b"))
+        self.assertEqual(generator._cache_get(b"a"), [1.0])
+        self.assertEqual(generator._cache_get(b"c"), [3.0])
+        
+        # A cache size of 0 disables caching
+        generator = self._generator(cache_size=0)
+        generator._cache_put(b"a", [1.0])
+        self.assertIsNone(generator._cache_get(b"a"))
+    
+    def test_encode_executor_created_once(self):
+        """Test that concurrent encodes share a single thread pool."""
+        generator = self._generator()
+        created = []
+        
+        def slow_executor(*args, **kwargs):
+            # Widen the window between checking for and creating the pool
+            time.sleep(0.05)
+            executor = ThreadPoolExecutor(*args, **kwargs)
+            created.append(executor)
+            return executor
+        
+        with patch.object(embedding_generator, 'ThreadPoolExecutor', side_effect=slow_executor):
+            threads = [
+                threading.Thread(target=generator._encode_images, args=(self.images,))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        generator.close()
+        
+        self.assertEqual(len(created), 1)
+        self.assertIsNone(generator._encode_executor)
+    
+    @unittest.skipIf(embedding_generator.aiohttp is None, "aiohttp not installed")
+    def test_session_recreated_per_event_loop(self):
+        """Test that a session from an earlier event loop is not reused."""
+        generator = self._generator()
+        sessions = []
+        
+        async def fake_aembed_chunk(image_bytes):
+            sessions.append(generator._session)
+            return self._embeddings(image_bytes)
+        
+        with patch.object(generator, '_aembed_chunk', side_effect=fake_aembed_chunk):
+            asyncio.run(generator.agenerate_embeddings(self.images[:1]))
+            results = asyncio.run(generator.agenerate_embeddings(self.images[1:2]))
+        asyncio.run(generator.aclose())
+        generator.close()
+        
+        self.assertEqual(results, [[1.0] * 4])
+        self.assertIsNot(sessions[0], sessions[1])
+        # The session of the finished loop is released, not left open
+        self.assertTrue(sessions[0].closed)
+        self.assertTrue(sessions[1].closed)
+    
+    @unittest.skipIf(embedding_generator.aiohttp is None, "aiohttp not installed")
+    def test_agenerate_embeddings(self):
+        """Test async sub-batching, caching and restoring the input order."""
+        generator = self._generator(sub_batch_size=2)
+        session = FakeSession(self._embeddings)
+        generator.generate_embeddings(self.images[:1])
+        
+        async def run():
+            generator._session = session
+            generator._session_loop = asyncio.get_running_loop()
+            return await generator.agenerate_embeddings(self.images)
+        
+        results = asyncio.run(run())
+        generator.close()
+        
+        self.assertEqual(results, [[float(i)] * 4 for i in range(6)])
+        # Only the images that were not cached are sent, in sub-batches
+        self.assertEqual(session.request_sizes, [2, 2, 1])
+    
+    @unittest.skipIf(embedding_generator.lmdb is None, "lmdb not installed")
+    def test_disk_cache(self):
+        """Test that embeddings are reused across generators through the disk cache."""
+        generator = self._generator(sub_batch_size=2, cache_dir=self.temp_dir.name)
+        self.failing_index = 3
+        generator.generate_embeddings(self.images[:4])
+        generator.close()
+        
+        # A new generator only sends the images of the failed sub-batch
+        self.failing_index = None
+        self.requests.clear()
+        generator = self._generator(sub_batch_size=2, cache_dir=self.temp_dir.name)
+        results = generator.generate_embeddings(self.images[:4])
+        generator.close()
+        
+        self.assertEqual(results, [[float(i)] * 4 for i in range(4)])
+        self.assertEqual(self.requests, [[2, 3]])
+        
+        # Entries are keyed by model
+        self.requests.clear()
+        generator = self._generator(model_name="other-model", cache_dir=self.temp_dir.name)
+        generator.generate_embeddings(self.images[:1])
+        generator.close()
+        self.assertEqual(self.requests, [[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
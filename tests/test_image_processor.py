@@ -3,14 +3,19 @@ Tests for the image processor module.
 """
 
 import os
+import pickle
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import unittest
 from unittest.mock import patch, MagicMock
 
-from PIL import Image
+from PIL import Image, ImageDraw
 import numpy as np
 
+from qdrantingest import image_processor
 from qdrantingest.image_processor import ImageProcessor
 
 
@@ -47,6 +52,33 @@ class TestImageProcessor(unittest.TestCase):
         image = self.processor.load_image("nonexistent.jpg")
         self.assertIsNone(image)
     
+    def test_load_image_is_cached(self):
+        """Test that repeated loads of the same image skip decoding."""
+        first = self.processor.load_image("test_image.jpg")
+        
+        with patch('qdrantingest.image_processor.Image.open', side_effect=AssertionError("image re-opened")):
+            second = self.processor.load_image("test_image.jpg")
+        self.assertEqual(second.size, first.size)
+    
+    def test_load_image_returns_copy(self):
+        """Test that modifying a loaded image doesn't affect later loads or crops."""
+        image = self.processor.load_image("test_image.jpg")
+        image.thumbnail((20, 20))
+        
+        self.assertEqual(self.processor.load_image("test_image.jpg").size, (300, 200))
+        cropped = self.processor.crop_object("test_image.jpg", bbox=[10, 10, 50, 40])
+        self.assertEqual(cropped.size, (50, 40))
+    
+    @unittest.skipUnless(hasattr(os, 'posix_fadvise'), "posix_fadvise not available")
+    def test_prefetch(self):
+        """Test asking the OS to read images ahead."""
+        with patch('os.posix_fadvise') as mock_fadvise:
+            self.processor.prefetch(["test_image.jpg", "nonexistent.jpg"])
+        
+        # Missing files are skipped
+        mock_fadvise.assert_called_once()
+        self.assertEqual(mock_fadvise.call_args[0][3], os.POSIX_FADV_WILLNEED)
+    
     def test_crop_by_bbox(self):
         """Test cropping an image using a bounding box."""
         image = self.processor.load_image("test_image.jpg")
@@ -92,6 +124,106 @@ class TestImageProcessor(unittest.TestCase):
         )
         self.assertIsNone(cropped)
     
+    def test_crop_object_converts_crop(self):
+        """Test that crops from non-RGB images are converted to RGB."""
+        Image.new('L', (300, 200), color=128).save(self.temp_path / "gray.png")
+        
+        cropped = self.processor.crop_object("gray.png", bbox=[50, 40, 100, 80])
+        self.assertEqual(cropped.mode, "RGB")
+        self.assertEqual(cropped.size, (100, 80))
+        self.assertEqual(cropped.getpixel((0, 0)), (128, 128, 128))
+        
+        # load_image still returns RGB by default
+        self.assertEqual(self.processor.load_image("gray.png").mode, "RGB")
+        self.assertEqual(self.processor.load_image("gray.png", convert=False).mode, "L")
+    
+    def test_crop_objects_batch(self):
+        """Test cropping several objects from one image."""
+        with patch.object(self.processor, 'load_image', wraps=self.processor.load_image) as mock_load:
+            cropped = self.processor.crop_objects_batch(
+                "test_image.jpg",
+                [([50, 40, 100, 80], None), ([0, 0, 30, 20], None), (None, None)]
+            )
+            mock_load.assert_called_once()
+        
+        self.assertEqual([c.size for c in cropped[:2]], [(100, 80), (30, 20)])
+        self.assertIsNone(cropped[2])
+        
+        # Test with non-existent image
+        cropped = self.processor.crop_objects_batch("nonexistent.jpg", [([50, 40, 100, 80], None)])
+        self.assertEqual(cropped, [None])
+    
+    def test_crop_objects_batch_clamps_bboxes(self):
+        """Test that batch cropping clamps boxes like single-object cropping."""
+        bboxes = [[250.7, 150.2, 100, 100], [-20.5, -10, 60.9, 40], [50, 40, -10, 80], [400, 300, 10, 10]]
+        
+        cropped = self.processor.crop_objects_batch("test_image.jpg", [(bbox, None) for bbox in bboxes])
+        expected = [self.processor.crop_object("test_image.jpg", bbox=bbox) for bbox in bboxes]
+        
+        self.assertEqual([c.size for c in cropped], [c.size for c in expected])
+        self.assertEqual(cropped[0].size, (50, 50))
+    
+    def test_process_batch(self):
+        """Test cropping and preprocessing objects from several images."""
+        Image.new('RGB', (100, 100), color='black').save(self.temp_path / "other.png")
+        processor = ImageProcessor(self.temp_path, num_workers=2)
+        
+        processed = processor.process_batch(
+            [
+                ("test_image.jpg", [50, 40, 100, 80], None),
+                ("other.png", [0, 0, 50, 50], None),
+                ("nonexistent.jpg", [0, 0, 50, 50], None),
+                ("test_image.jpg", [0, 0, 30, 20], None),
+            ],
+            target_size=(32, 32)
+        )
+        
+        self.assertEqual(len(processed), 4)
+        self.assertIsNone(processed[2])
+        self.assertEqual([processed[i].size for i in (0, 1, 3)], [(32, 32)] * 3)
+        self.assertEqual(processed[1].getpixel((0, 0)), (0, 0, 0))
+        self.assertGreater(processed[3].getpixel((0, 0))[0], 200)
+        
+        # The processor can still be pickled for worker processes
+        restored = pickle.loads(pickle.dumps(processor))
+        self.assertEqual(restored.num_workers, 2)
+        
+        # close() releases the worker threads; later batches start a new pool
+        executor = processor._executor
+        processor.close()
+        self.assertIsNone(processor._executor)
+        self.assertTrue(executor._shutdown)
+        processed = processor.process_batch(
+            [("test_image.jpg", [0, 0, 30, 20], None), ("other.png", [0, 0, 50, 50], None)]
+        )
+        self.assertEqual(len(processed), 2)
+        processor.close()
+    
+    def test_process_batch_executor_created_once(self):
+        """Test that concurrent batches share a single thread pool."""
+        Image.new('RGB', (100, 100), color='black').save(self.temp_path / "other.png")
+        processor = ImageProcessor(self.temp_path, num_workers=2)
+        items = [("test_image.jpg", [0, 0, 30, 20], None), ("other.png", [0, 0, 50, 50], None)]
+        created = []
+        
+        def slow_executor(*args, **kwargs):
+            # Widen the window between checking for and creating the pool
+            time.sleep(0.05)
+            executor = ThreadPoolExecutor(*args, **kwargs)
+            created.append(executor)
+            return executor
+        
+        with patch.object(image_processor, 'ThreadPoolExecutor', side_effect=slow_executor):
+            threads = [threading.Thread(target=processor.process_batch, args=(items,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        processor.close()
+        
+        self.assertEqual(len(created), 1)
+        self.assertIsNone(processor._executor)
+    
     def test_crop_by_segmentation(self):
         """Test cropping an image using a segmentation mask."""
         # Create an instance with segmentation enabled
@@ -110,6 +242,57 @@ class TestImageProcessor(unittest.TestCase):
             self.assertEqual(cropped.width, 100)
             self.assertEqual(cropped.height, 80)
     
+    def test_crop_by_segmentation_masks_background(self):
+        """Test that pixels outside the segmentation mask are black."""
+        processor = ImageProcessor(self.temp_path, use_segmentation=True)
+        image = processor.load_image("test_image.jpg")
+        
+        # Right triangle filling the lower-left half of its bounding box
+        segmentation = [[50, 40, 50, 140, 150, 140]]
+        cropped = np.asarray(processor._crop_by_segmentation(image, segmentation))
+        
+        self.assertEqual(cropped.dtype, np.uint8)
+        np.testing.assert_array_equal(cropped[0, -1], [0, 0, 0])
+        self.assertTrue((cropped[-1, 0] > 200).all())
+    
+    def test_crop_by_segmentation_matches_full_image_mask(self):
+        """Test that masks sized to the polygons match masks covering the whole image."""
+        processor = ImageProcessor(self.temp_path, use_segmentation=True)
+        rng = np.random.default_rng(0)
+        image = Image.fromarray(rng.integers(0, 256, (200, 300, 3), dtype=np.uint8))
+        
+        segmentations = [
+            # Two overlapping squares, partly outside the image
+            [[40, 30, 120, 30, 120, 110, 40, 110], [80, 70, 320, 70, 320, 150, 80, 150]],
+            # Diagonal edges with non-integer vertices
+            [[10.6, 20.3, 90.2, 5.7, 140.9, 95.5, 30.4, 120.8]],
+            # Partly left of and above the image
+            [[-15.5, -8.2, 60.7, 10.1, 25.3, 70.9]],
+        ]
+        # Random convex polygons with float vertices
+        for _ in range(50):
+            angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(3, 12)))
+            center = rng.uniform(0, [300, 200])
+            radius = rng.uniform(3, 80, 2)
+            points = np.column_stack([
+                center[0] + radius[0] * np.cos(angles),
+                center[1] + radius[1] * np.sin(angles)
+            ])
+            segmentations.append([points.ravel().tolist()])
+        
+        for segmentation in segmentations:
+            # Reference: rasterize into a mask covering the whole image
+            mask = Image.new('L', image.size, 0)
+            draw = ImageDraw.Draw(mask)
+            for polygon in segmentation:
+                draw.polygon(polygon, fill=255)
+            bbox = mask.getbbox()
+            expected = np.array(image.crop(bbox))
+            expected[np.asarray(mask.crop(bbox)) == 0] = 0
+            
+            cropped = np.asarray(processor._crop_by_segmentation(image, segmentation))
+            np.testing.assert_array_equal(cropped, expected)
+    
     def test_crop_object_with_segmentation(self):
         """Test cropping an object using a segmentation mask."""
         # Create an instance with segmentation enabled
@@ -143,6 +326,21 @@ class TestImageProcessor(unittest.TestCase):
         processed = self.processor.preprocess_image(image, target_size=(160, 120))
         self.assertEqual(processed.width, 160)
         self.assertEqual(processed.height, 120)
+    
+    def test_preprocess_image_resampling(self):
+        """Test that preprocessing resizes with BILINEAR and leaves the source image alone."""
+        # Noise, so that results differ between resampling filters
+        noise = np.random.default_rng(0).integers(0, 256, (200, 300, 3), dtype=np.uint8)
+        Image.fromarray(noise).save(self.test_image_path)
+        image = Image.open(self.test_image_path)
+        expected = Image.open(self.test_image_path).resize((32, 32), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        
+        processed = self.processor.preprocess_image(image, target_size=(32, 32))
+        
+        self.assertEqual(processed.tobytes(), expected.tobytes())
+        # The caller's image is not reduced while decoding
+        self.assertEqual(image.size, (300, 200))
+        self.assertEqual(np.asarray(image).shape, (200, 300, 3))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,220 @@
+"""
+Tests for the batching pipeline in main.py.
+"""
+
+import asyncio
+import unittest
+from concurrent.futures import Executor, Future
+from unittest.mock import patch
+
+from PIL import Image
+
+from main import iter_cropped_batches, main_async, parse_args, process_annotations
+
+
+class FakeImageProcessor:
+    """Image processor that records calls and fails to crop objects without a bbox."""
+    
+    def __init__(self):
+        self.prefetched = []
+        self.cropped = []
+    
+    def prefetch(self, image_filenames):
+        self.prefetched.extend(image_filenames)
+    
+    def crop_objects_batch(self, image_filename, objects):
+        self.cropped.append((image_filename, len(objects)))
+        return [Image.new('RGB', (4, 4)) if bbox else None for bbox, _ in objects]
+
+
+class FakeExecutor(Executor):
+    """Executor that runs tasks immediately and records how many were submitted."""
+    
+    def __init__(self):
+        self.submitted = 0
+    
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class FakeEmbeddingGenerator:
+    """Embedding generator returning the size of each image as its embedding."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate_embeddings(self, images):
+        self.calls += 1
+        return [[float(image.width)] * 2 for image in images]
+    
+    async def agenerate_embeddings(self, images):
+        await asyncio.sleep(0)
+        return self.generate_embeddings(images)
+    
+    async def aclose(self):
+        pass
+
+
+class FakeUploader:
+    """Uploader that records the uploaded objects, optionally failing every upload."""
+    
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+    
+    def upload_batch(self, objects):
+        if self.fail:
+            raise ConnectionError("upload failed")
+        self.batches.append(objects)
+    
+    async def aupload_batch(self, objects):
+        await asyncio.sleep(0)
+        self.upload_batch(objects)
+    
+    async def aclose(self):
+        pass
+
+
+class TestPipeline(unittest.TestCase):
+    """Test cases for cropping, embedding and uploading batches of annotations."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.images_by_id = {
+            image_id: {"id": image_id, "file_name": f"image{image_id}.jpg"}
+            for image_id in (1, 2, 3)
+        }
+        self.categories_by_id = {1: {"id": 1, "name": "person"}}
+        
+        # Image 1 has three objects, image 2 one that cannot be cropped, image 3 four
+        layout = [(1, True)] * 3 + [(2, False)] + [(3, True)] * 4
+        self.annotations = [
+            {
+                "id": ann_id,
+                "image_id": image_id,
+                "category_id": 1,
+                "bbox": [0, 0, 4, 4] if has_bbox else None
+            }
+            for ann_id, (image_id, has_bbox) in enumerate(layout, start=1)
+        ]
+        self.processor = FakeImageProcessor()
+    
+    def _batches(self, **kwargs):
+        return list(iter_cropped_batches(
+            self.annotations, self.images_by_id, self.categories_by_id,
+            self.processor, batch_size=3, **kwargs
+        ))
+    
+    def test_iter_cropped_batches(self):
+        """Test batch sizes, order and counts across image groups."""
+        batches = self._batches()
+        
+        # Batches count every annotation, but only hold the cropped ones
+        self.assertEqual([batch.num_annotations for batch in batches], [3, 3, 2])
+        self.assertEqual(
+            [[ann["id"] for ann in batch.annotations] for batch in batches],
+            [[1, 2, 3], [5, 6], [7, 8]]
+        )
+        for batch in batches:
+            self.assertEqual(len(batch.images), len(batch.annotations))
+            self.assertEqual(
+                [info["id"] for info in batch.image_infos],
+                [ann["image_id"] for ann in batch.annotations]
+            )
+            self.assertEqual([cat["name"] for cat in batch.categories], ["person"] * len(batch.images))
+        
+        # Each image is cropped once for all of its objects
+        self.assertEqual(self.processor.cropped, [("image1.jpg", 3), ("image2.jpg", 1), ("image3.jpg", 4)])
+        self.assertEqual(self.processor.prefetched, ["image1.jpg", "image2.jpg", "image3.jpg"])
+    
+    def test_iter_cropped_batches_groups_by_image(self):
+        """Test that annotations of an image are cropped together wherever they appear."""
+        self.annotations.append({"id": 9, "image_id": 1, "category_id": 1, "bbox": [0, 0, 4, 4]})
+        batches = self._batches()
+        
+        self.assertEqual([batch.num_annotations for batch in batches], [3, 3, 3])
+        self.assertEqual([ann["id"] for ann in batches[1].annotations], [9, 5])
+        self.assertEqual(self.processor.cropped[0], ("image1.jpg", 4))
+    
+    def test_iter_cropped_batches_prefetch_window(self):
+        """Test that at most `prefetch` annotations are cropped ahead of the consumer."""
+        executor = FakeExecutor()
+        batches = iter_cropped_batches(
+            self.annotations, self.images_by_id, self.categories_by_id,
+            self.processor, batch_size=1, executor=executor, prefetch=2, readahead=1
+        )
+        
+        # Image 1's three objects fill the window, so image 2 is not cropped yet
+        next(batches)
+        self.assertEqual(executor.submitted, 1)
+        self.assertEqual(self.processor.prefetched, ["image1.jpg", "image2.jpg"])
+        
+        # Images are read ahead one image before they are cropped
+        remaining = list(batches)
+        self.assertEqual(executor.submitted, 3)
+        self.assertEqual(self.processor.prefetched, ["image1.jpg", "image2.jpg", "image3.jpg"])
+        self.assertEqual([batch.num_annotations for batch in remaining], [1] * 7)
+    
+    def test_process_annotations(self):
+        """Test that every cropped object is embedded and uploaded."""
+        uploader = FakeUploader()
+        process_annotations(
+            self.annotations, self.images_by_id, self.categories_by_id, self.processor,
+            FakeEmbeddingGenerator(), uploader, batch_size=3, crop_executor=FakeExecutor()
+        )
+        
+        self.assertEqual([[obj["id"] for obj in batch] for batch in uploader.batches], [[1, 2, 3], [5, 6], [7, 8]])
+        obj = uploader.batches[0][0]
+        self.assertEqual(obj["vector"], [4.0, 4.0])
+        self.assertEqual(obj["payload"]["file_name"], "image1.jpg")
+        self.assertEqual(obj["payload"]["category_name"], "person")
+    
+    def test_main_async(self):
+        """Test that the async pipeline embeds and uploads every cropped object."""
+        uploader = FakeUploader()
+        asyncio.run(main_async(
+            self.annotations, self.images_by_id, self.categories_by_id, self.processor,
+            FakeEmbeddingGenerator(), uploader, batch_size=2, max_concurrent_requests=2
+        ))
+        
+        uploaded = sorted(obj["id"] for batch in uploader.batches for obj in batch)
+        self.assertEqual(uploaded, [1, 2, 3, 5, 6, 7, 8])
+        self.assertTrue(all(len(batch) <= 2 for batch in uploader.batches))
+    
+    def test_main_async_stops_on_failed_upload(self):
+        """Test that the async pipeline stops embedding once an upload fails."""
+        embedding_generator = FakeEmbeddingGenerator()
+        annotations = [
+            {"id": ann_id, "image_id": 1 + ann_id % 3, "category_id": 1, "bbox": [0, 0, 4, 4]}
+            for ann_id in range(1, 101)
+        ]
+        
+        with self.assertRaises(ConnectionError):
+            asyncio.run(main_async(
+                annotations, self.images_by_id, self.categories_by_id, self.processor,
+                embedding_generator, FakeUploader(fail=True), batch_size=1, max_concurrent_requests=2
+            ))
+        
+        # Only the batches already in flight when the first upload failed were embedded
+        self.assertLess(embedding_generator.calls, 10)
+
+
+class TestParseArgs(unittest.TestCase):
+    """Test cases for command line parsing."""
+    
+    def _parse(self, *args):
+        argv = ["main.py", "--annotations", "annotations.json", "--images", "images", *args]
+        with patch("sys.argv", argv):
+            return parse_args()
+    
+    def test_no_quantization(self):
+        """Test that quantization is on unless --no-quantization is given."""
+        self.assertFalse(self._parse().no_quantization)
+        self.assertTrue(self._parse("--no-quantization").no_quantization)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+"""
+Tests for the QDrant uploader module.
+"""
+
+import asyncio
+import json
+import queue
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from qdrant_client.http import models
+
+from qdrantingest import qdrant_uploader
+from qdrantingest.qdrant_uploader import ParallelUploader, QdrantUploader, _build_batch
+
+
+def _recording_worker(queue, collection_name, url, api_key, prefer_grpc, wait):
+    """Uploader process that writes the IDs it receives to the file `collection_name`."""
+    received = []
+    while True:
+        objects = queue.get()
+        if objects is None:
+            break
+        received.append([obj['id'] for obj in objects])
+    Path(collection_name).write_text(json.dumps(received))
+
+
+def _failing_worker(queue, collection_name, url, api_key, prefer_grpc, wait):
+    """Uploader process that dies immediately."""
+    raise SystemExit(1)
+
+
+class TestQdrantUploader(unittest.TestCase):
+    """Test cases for the QdrantUploader class."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        # Create a temporary directory for the local database
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.objects = [
+            {'id': i, 'vector': [0.1 * i, 0.2, 0.3, 0.4], 'payload': {'image_id': i % 2, 'category_id': 1}}
+            for i in range(1, 5)
+        ]
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def _uploader(self, collection_name: str = "objects", **kwargs) -> QdrantUploader:
+        """Create an uploader on the test database."""
+        # Payload indexes are not supported by local storage
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            with patch('builtins.print'):
+                uploader = QdrantUploader(collection_name, 4, path=self.temp_dir.name, **kwargs)
+        self.addCleanup(uploader.client.close)
+        return uploader
+    
+    def test_build_batch(self):
+        """Test converting upload objects into a columnar batch."""
+        batch = _build_batch(self.objects)
+        
+        self.assertIsInstance(batch, models.Batch)
+        self.assertEqual(batch.ids, [1, 2, 3, 4])
+        # Vectors are passed on unchanged, without rounding
+        self.assertEqual(batch.vectors, [obj['vector'] for obj in self.objects])
+        self.assertEqual(batch.payloads, [obj['payload'] for obj in self.objects])
+    
+    def test_upload_batch(self):
+        """Test uploading a batch to local storage."""
+        uploader = self._uploader()
+        uploader.upload_batch(self.objects)
+        uploader.upload_batch([])
+        
+        self.assertEqual(uploader.client.count("objects").count, 4)
+        point = uploader.client.retrieve("objects", [3], with_vectors=True)[0]
+        self.assertEqual(point.payload, {'image_id': 1, 'category_id': 1})
+    
+    def test_collection_exists_is_cached(self):
+        """Test that the collection is only looked up until it is known to exist."""
+        uploader = self._uploader()
+        
+        with patch.object(uploader.client, 'get_collections', side_effect=AssertionError("looked up")):
+            self.assertTrue(uploader.collection_exists())
+        
+        uploader._collection_ready = False
+        self.assertTrue(uploader.collection_exists())
+        self.assertTrue(uploader._collection_ready)
+    
+    def test_parallel_upload_worker(self):
+        """Test that a worker uploads every queued batch until the sentinel."""
+        batches = queue.Queue()
+        for batch in (self.objects[:2], self.objects[2:], None, self.objects):
+            batches.put(batch)
+        
+        with patch.object(qdrant_uploader, 'QdrantClient') as mock_client:
+            qdrant_uploader._parallel_upload_worker(batches, "objects", "http://qdrant:6333", None, False, False)
+        
+        upserts = mock_client.return_value.upsert.call_args_list
+        self.assertEqual([call.kwargs['points'].ids for call in upserts], [[1, 2], [3, 4]])
+        # Batches after the sentinel are left for other workers
+        self.assertEqual(batches.qsize(), 1)
+    
+    def test_parallel_uploader_close(self):
+        """Test that close() waits for every queued batch to be consumed."""
+        # The worker writes the batches it received to the file named by the collection
+        result_file = Path(self.temp_dir.name) / "received.json"
+        with patch.object(qdrant_uploader, '_parallel_upload_worker', _recording_worker):
+            uploader = ParallelUploader(str(result_file), url="http://qdrant:6333", num_workers=1)
+        
+        for i in range(5):
+            uploader.upload_batch([self.objects[i % 4]])
+        uploader.upload_batch([])
+        uploader.close()
+        
+        self.assertEqual(json.loads(result_file.read_text()), [[1], [2], [3], [4], [1]])
+        self.assertTrue(all(worker.exitcode == 0 for worker in uploader._workers))
+    
+    def test_parallel_uploader_dead_worker(self):
+        """Test that a dead uploader process is reported instead of blocking."""
+        with patch.object(qdrant_uploader, '_parallel_upload_worker', _failing_worker):
+            uploader = ParallelUploader("objects", url="http://qdrant:6333", num_workers=2)
+        for worker in uploader._workers:
+            worker.join(timeout=10)
+        
+        with self.assertRaises(RuntimeError):
+            uploader.upload_batch(self.objects)
+        with self.assertRaises(RuntimeError):
+            uploader.close()
+    
+    def test_finalize(self):
+        """Test that indexing is only re-enabled on collections created deferred."""
+        uploader = self._uploader()
+        self.assertTrue(uploader.created_collection)
+        with patch.object(uploader.client, 'update_collection', wraps=uploader.client.update_collection) as mock_update:
+            uploader.finalize()
+            uploader.finalize()
+        mock_update.assert_called_once()
+        config = uploader.client.get_collection("objects").config
+        self.assertEqual(config.optimizer_config.indexing_threshold, 20000)
+        uploader.client.close()
+        
+        # The collection already exists, so its settings are left alone
+        uploader = self._uploader()
+        self.assertFalse(uploader.created_collection)
+        with patch.object(uploader.client, 'update_collection') as mock_update:
+            uploader.finalize()
+        mock_update.assert_not_called()
+    
+    def test_get_filter(self):
+        """Test that filters are built once per set of conditions."""
+        uploader = self._uploader()
+        
+        filter_obj = uploader._get_filter({'category_id': 1, 'image_id': 0})
+        self.assertIs(uploader._get_filter({'image_id': 0, 'category_id': 1}), filter_obj)
+        self.assertIsNot(uploader._get_filter({'category_id': 2}), filter_obj)
+        self.assertEqual(
+            {(condition.key, condition.match.value) for condition in filter_obj.must},
+            {('category_id', 1), ('image_id', 0)}
+        )
+        
+        # The cached filter selects matching points
+        uploader.upload_batch(self.objects)
+        points, _ = uploader.client.scroll("objects", scroll_filter=filter_obj)
+        self.assertEqual(sorted(point.id for point in points), [2, 4])
+    
+    def test_quantization_config(self):
+        """Test that new collections keep int8 quantized vectors unless disabled."""
+        create_collection = qdrant_uploader.QdrantClient.create_collection
+        with patch.object(qdrant_uploader.QdrantClient, 'create_collection', autospec=True,
+                          side_effect=create_collection) as mock_create:
+            uploader = self._uploader()
+            uploader.client.close()
+            uploader = self._uploader(quantize=False, collection_name="unquantized")
+        
+        # Local storage does not keep the quantization config, so check the request
+        quantized, unquantized = (call.kwargs['quantization_config'] for call in mock_create.call_args_list)
+        self.assertEqual(quantized.scalar.type, models.ScalarType.INT8)
+        self.assertTrue(quantized.scalar.always_ram)
+        self.assertIsNone(unquantized)
+    
+    def test_remote_client_options(self):
+        """Test that prefer_grpc and wait reach the sync and async clients."""
+        with patch.object(qdrant_uploader, 'QdrantClient') as mock_client, \
+                patch.object(qdrant_uploader, 'AsyncQdrantClient') as mock_async_client:
+            # The collection already exists on the server
+            mock_client.return_value.get_collections.return_value.collections = [
+                models.CollectionDescription(name="objects")
+            ]
+            mock_async_client.return_value.upsert = AsyncMock()
+            mock_async_client.return_value.close = AsyncMock()
+            
+            uploader = QdrantUploader(
+                "objects", 4, url="http://qdrant:6333", prefer_grpc=True, wait=True
+            )
+            uploader.upload_batch(self.objects)
+            
+            async def upload():
+                await uploader.aupload_batch(self.objects)
+                await uploader.aclose()
+            
+            asyncio.run(upload())
+        
+        self.assertTrue(mock_client.call_args.kwargs['prefer_grpc'])
+        self.assertTrue(mock_client.return_value.upsert.call_args.kwargs['wait'])
+        self.assertTrue(mock_async_client.call_args.kwargs['prefer_grpc'])
+        self.assertTrue(mock_async_client.return_value.upsert.call_args.kwargs['wait'])
+    
+    def test_parallel_uploader_options(self):
+        """Test that prefer_grpc and wait reach the uploader processes' clients."""
+        with patch.object(qdrant_uploader.multiprocessing, 'Process') as mock_process:
+            ParallelUploader("objects", url="http://qdrant:6333", num_workers=1, prefer_grpc=True, wait=True)
+        _, collection_name, url, api_key, prefer_grpc, wait = mock_process.call_args.kwargs['args']
+        self.assertEqual((collection_name, url, prefer_grpc, wait), ("objects", "http://qdrant:6333", True, True))
+        
+        batches = queue.Queue()
+        batches.put(self.objects)
+        batches.put(None)
+        with patch.object(qdrant_uploader, 'QdrantClient') as mock_client:
+            qdrant_uploader._parallel_upload_worker(batches, "objects", "http://qdrant:6333", None, True, True)
+        self.assertTrue(mock_client.call_args.kwargs['prefer_grpc'])
+        self.assertTrue(mock_client.return_value.upsert.call_args.kwargs['wait'])
+
+
+if __name__ == '__main__':
+    unittest.main()